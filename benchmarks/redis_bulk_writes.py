@@ -0,0 +1,103 @@
+"""Per-frame cost of writing a `!ticker@arr` frame to Redis.
+
+Compares the old one-SET-at-a-time writer with the pipelined
+`save_coin_data_to_redis`. Needs the Redis from `.env` (RS_HOST/RS_PORT).
+
+    python -m benchmarks.redis_bulk_writes --tickers 400 --frames 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import aioredis
+from aioredis.client import Pipeline
+
+TICKERS_MAX = 1000
+
+# Register the synthetic BENCH*USDT pairs so the ingestion filter keeps them
+with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as symbols_file:
+    json.dump({"symbols": [{"symbol": f"BENCH{i}USDT", "status": "TRADING", "baseAsset": f"BENCH{i}",
+                            "quoteAsset": "USDT"} for i in range(TICKERS_MAX)]}, symbols_file)
+os.environ["SYMBOLS_FILE"] = symbols_file.name
+
+from src.config import REDIS_URL, CURRENCY_CACHE_TIME
+from src.database import init_redis_pool, close_redis_pool
+from src.wallet.services import save_coin_data_to_redis
+
+
+def make_frame(tickers: int, event_time: int, n: int):
+    # Every frame moves every price, or the change-only filter in
+    # save_coin_data_to_redis would skip all frames after the first
+    return [
+        {"e": "24hrTicker", "E": event_time, "s": f"BENCH{i}USDT", "c": f"{i}.{n:08d}",
+         "o": "1.0", "h": "2.0", "l": "0.5", "v": "12345.6", "q": "54321.0"}
+        for i in range(tickers)
+    ]
+
+
+# Every command sent on its own and every pipeline flush is one round-trip
+round_trips = 0
+
+
+def counted(method):
+    async def wrapper(*args, **kwargs):
+        global round_trips
+        round_trips += 1
+        return await method(*args, **kwargs)
+    return wrapper
+
+
+aioredis.Redis.execute_command = counted(aioredis.Redis.execute_command)
+Pipeline.execute = counted(Pipeline.execute)
+
+
+async def save_sequential(json_list):
+    redis_client = await aioredis.from_url(REDIS_URL)
+    async with redis_client:
+        for json_data in json_list:
+            if "USDT" not in json_data["s"]:
+                continue
+            history_key = f"{json_data['E']}_{json_data['s']}"
+            await redis_client.set(history_key, str(json_data), ex=CURRENCY_CACHE_TIME)
+            await redis_client.set(json_data["s"], str(json_data))
+
+
+async def run(writer, tickers: int, frames: int):
+    global round_trips
+    round_trips = 0
+    started = time.perf_counter()
+    for n in range(frames):
+        await writer(make_frame(tickers, event_time=int(time.time() * 1000) + n, n=n))
+    return (time.perf_counter() - started) * 1000 / frames, round_trips / frames
+
+
+async def cleanup():
+    redis_client = await aioredis.from_url(REDIS_URL)
+    async with redis_client:
+        keys = [key async for key in redis_client.scan_iter("*BENCH*USDT", count=1000)]
+        if keys:
+            await redis_client.delete(*keys)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=400, choices=range(1, TICKERS_MAX + 1), metavar="N")
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    await init_redis_pool()
+    before, before_trips = await run(save_sequential, args.tickers, args.frames)
+    after, after_trips = await run(save_coin_data_to_redis, args.tickers, args.frames)
+    await close_redis_pool()
+    await cleanup()
+
+    print(f"{args.tickers} tickers/frame, {args.frames} frames")
+    print(f"sequential: {before_trips:.2f} round-trips/frame, {before:.2f} ms/frame")
+    print(f"pipelined:  {after_trips:.2f} round-trips/frame, {after:.2f} ms/frame")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+"""Concurrent trades against one wallet: throughput and lost updates.
+
+Runs the same burst of purchases twice against the database from `.env`:
+once with the old read-balance-then-write pattern, once through
+`apply__purchase`, and checks the final balance, holding and journal size
+against what the purchases should have produced. A third run interleaves
+purchases and sales through `run__trade`, the mix that used to deadlock
+when the two locked their holdings in opposite orders. Pass the id of a
+user that already has a wallet; its USDT balance and BTC holding are
+overwritten.
+
+    python -m benchmarks.trade_concurrency --user-id 1 --trades 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+from decimal import Decimal
+
+from sqlalchemy import select, update, delete, func
+
+from src.database import session_scope
+from src.wallet.models import Wallet, Currency, Transaction
+from src.wallet.money import cost_of, proceeds_of
+from src.wallet.services import apply__purchase, apply__sale, credit__currency, run__trade
+
+START_BALANCE = Decimal(1_000_000)
+START_HOLDING = Decimal(1_000)
+PRICE = Decimal("2.5")
+QUANTITY = Decimal("0.1")
+COIN = "BTC"
+
+
+async def reset(wallet_id: int, holding: Decimal = Decimal(0)):
+    async with session_scope() as session:
+        async with session.begin():
+            await session.execute(delete(Currency).where((Currency.wallet_id == wallet_id) & (Currency.name == COIN)))
+            await session.execute(delete(Transaction).where(Transaction.wallet_id == wallet_id))
+            await session.execute(update(Currency).where(
+                (Currency.wallet_id == wallet_id) & (Currency.name == "USDT")).values(quantity=START_BALANCE))
+            if holding:
+                await credit__currency(wallet_id=wallet_id, name=COIN, quantity=holding, session=session)
+
+
+async def read_state(wallet_id: int):
+    async with session_scope() as session:
+        quantities = dict((await session.execute(
+            select(Currency.name, func.sum(Currency.quantity)).where(Currency.wallet_id == wallet_id)
+            .group_by(Currency.name))).all())
+        journal = (await session.execute(
+            select(func.count()).select_from(Transaction).where(Transaction.wallet_id == wallet_id))).scalar()
+    return quantities.get("USDT"), quantities.get(COIN, 0), journal
+
+
+async def legacy_purchase(wallet_id: int):
+    # Separate sessions and commits, as buy__currency used to do
+    async with session_scope() as session:
+        balance = (await session.execute(select(Currency.quantity).where(
+            (Currency.wallet_id == wallet_id) & (Currency.name == "USDT")))).scalar()
+    async with session_scope() as session:
+        holding = (await session.execute(select(Currency.quantity).where(
+            (Currency.wallet_id == wallet_id) & (Currency.name == COIN)))).scalar()
+    async with session_scope() as session:
+        if holding is None:
+            await credit__currency(wallet_id=wallet_id, name=COIN, quantity=QUANTITY, session=session)
+        else:
+            await session.execute(update(Currency).where(
+                (Currency.wallet_id == wallet_id) & (Currency.name == COIN)).values(quantity=holding + QUANTITY))
+        await session.commit()
+    async with session_scope() as session:
+        await session.execute(Transaction.__table__.insert().values(
+            wallet_id=wallet_id, currency=COIN, quantity=QUANTITY, price=PRICE, type="PURCHASE"))
+        await session.commit()
+    async with session_scope() as session:
+        await session.execute(update(Currency).where(
+            (Currency.wallet_id == wallet_id) & (Currency.name == "USDT")).values(quantity=balance - QUANTITY * PRICE))
+        await session.commit()
+
+
+async def atomic_purchase(wallet_id: int):
+    async with session_scope() as session:
+        async with session.begin():
+            await apply__purchase(wallet_id=wallet_id, currency=COIN, quantity=QUANTITY, price=PRICE, session=session)
+
+
+async def retried_purchase(wallet_id: int):
+    async with session_scope() as session:
+        await run__trade(session, lambda: apply__purchase(
+            wallet_id=wallet_id, currency=COIN, quantity=QUANTITY, price=PRICE, session=session))
+
+
+async def retried_sale(wallet_id: int):
+    async with session_scope() as session:
+        await run__trade(session, lambda: apply__sale(
+            wallet_id=wallet_id, currency=COIN, quantity=QUANTITY, price=PRICE, session=session))
+
+
+async def run(name: str, operations: list, wallet_id: int, concurrency: int, holding: Decimal = Decimal(0)):
+    await reset(wallet_id, holding)
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = []
+
+    async def one(operation):
+        async with semaphore:
+            try:
+                await operation(wallet_id)
+            except Exception as e:
+                failures.append(e)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(operation) for operation in operations))
+    elapsed = time.perf_counter() - started
+
+    sales = sum(operation is retried_sale for operation in operations)
+    purchases = len(operations) - sales
+    balance, holding_after, journal = await read_state(wallet_id)
+    expected_balance = START_BALANCE - purchases * cost_of(QUANTITY, PRICE) + sales * proceeds_of(QUANTITY, PRICE)
+    expected_holding = holding + (purchases - sales) * QUANTITY
+    lost = round((balance - expected_balance) / (QUANTITY * PRICE))
+    print(f"{name:<8} {len(operations) / elapsed:8.1f} trades/s  balance={balance} (expected {expected_balance})  "
+          f"{COIN}={holding_after} (expected {expected_holding})  journal={journal}  lost updates={lost}  "
+          f"failed={len(failures)}")
+    for error in failures[:5]:
+        print(f"         {type(error).__name__}: {error}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--trades", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    async with session_scope() as session:
+        wallet_id = (await session.execute(select(Wallet.id).where(Wallet.user_id == args.user_id))).scalar()
+    if wallet_id is None:
+        raise SystemExit(f"User {args.user_id} has no wallet")
+
+    await run("legacy", [legacy_purchase] * args.trades, wallet_id, args.concurrency)
+    await run("atomic", [atomic_purchase] * args.trades, wallet_id, args.concurrency)
+    # Alternating buys and sells on the same two holdings; starts with enough
+    # coins that no sale can run out
+    mixed = [retried_purchase, retried_sale] * (args.trades // 2)
+    await run("mixed", mixed, wallet_id, args.concurrency, holding=START_HOLDING)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
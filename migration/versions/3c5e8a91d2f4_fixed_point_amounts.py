@@ -0,0 +1,51 @@
+"""fixed-point amounts
+
+Revision ID: 3c5e8a91d2f4
+Revises: fe00b1a21774
+Create Date: 2026-10-17 10:12:41.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c5e8a91d2f4'
+down_revision: Union[str, None] = 'fe00b1a21774'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('currency', 'quantity',
+                    existing_type=sa.Float(),
+                    type_=sa.Numeric(precision=36, scale=8),
+                    existing_nullable=False,
+                    postgresql_using='round(quantity::numeric, 8)')
+    op.alter_column('transaction', 'quantity',
+                    existing_type=sa.Integer(),
+                    type_=sa.Numeric(precision=36, scale=8),
+                    existing_nullable=False)
+    op.alter_column('transaction', 'price',
+                    existing_type=sa.Integer(),
+                    type_=sa.Numeric(precision=36, scale=8),
+                    existing_nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('transaction', 'price',
+                    existing_type=sa.Numeric(precision=36, scale=8),
+                    type_=sa.Integer(),
+                    existing_nullable=False,
+                    postgresql_using='round(price)::integer')
+    op.alter_column('transaction', 'quantity',
+                    existing_type=sa.Numeric(precision=36, scale=8),
+                    type_=sa.Integer(),
+                    existing_nullable=False,
+                    postgresql_using='round(quantity)::integer')
+    op.alter_column('currency', 'quantity',
+                    existing_type=sa.Numeric(precision=36, scale=8),
+                    type_=sa.Float(),
+                    existing_nullable=False)
@@ -0,0 +1,27 @@
+"""transaction history index
+
+Revision ID: 8b14f6e0c7a2
+Revises: 3c5e8a91d2f4
+Create Date: 2026-10-17 11:03:27.904112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b14f6e0c7a2'
+down_revision: Union[str, None] = '3c5e8a91d2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_transaction_wallet_id_executed_at_id', 'transaction',
+                    ['wallet_id', 'executed_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transaction_wallet_id_executed_at_id', table_name='transaction')
@@ -0,0 +1,43 @@
+"""unique wallet currency
+
+Revision ID: d71a0c3e95b8
+Revises: 8b14f6e0c7a2
+Create Date: 2026-10-17 11:41:09.276530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd71a0c3e95b8'
+down_revision: Union[str, None] = '8b14f6e0c7a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Merge duplicate holdings into the oldest row of each (wallet_id, name)
+    op.execute("""
+        UPDATE currency AS c
+        SET quantity = d.total
+        FROM (
+            SELECT min(id) AS keep_id, sum(quantity) AS total
+            FROM currency
+            GROUP BY wallet_id, name
+            HAVING count(*) > 1
+        ) AS d
+        WHERE c.id = d.keep_id
+    """)
+    op.execute("""
+        DELETE FROM currency AS c
+        USING currency AS k
+        WHERE c.wallet_id = k.wallet_id AND c.name = k.name AND c.id > k.id
+    """)
+    op.create_unique_constraint('uq_currency_wallet_id_name', 'currency', ['wallet_id', 'name'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_currency_wallet_id_name', 'currency', type_='unique')
@@ -1,5 +1,7 @@
-from fastapi_users import FastAPIUsers
+import jwt
+from fastapi_users import FastAPIUsers, exceptions
 from fastapi_users.authentication import BearerTransport, JWTStrategy, AuthenticationBackend
+from fastapi_users.jwt import decode_jwt
 
 from src.auth.services import get_user_manager
 from src.auth.models import User
@@ -10,8 +12,29 @@ bearer_transport = BearerTransport(tokenUrl="auth/jwt/login")
 SECRET = SECRET
 
 
+class CachedJWTStrategy(JWTStrategy):
+    """Resolves the token's user from the user cache instead of the DB."""
+
+    async def read_token(self, token, user_manager):
+        if token is None:
+            return None
+
+        try:
+            data = decode_jwt(token, self.decode_key, self.token_audience, algorithms=[self.algorithm])
+            user_id = data.get("sub")
+            if user_id is None:
+                return None
+        except jwt.PyJWTError:
+            return None
+
+        try:
+            return await user_manager.get_cached(user_manager.parse_id(user_id))
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+
+
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=SECRET, lifetime_seconds=3600)
+    return CachedJWTStrategy(secret=SECRET, lifetime_seconds=3600)
 
 
 auth_backend = AuthenticationBackend(
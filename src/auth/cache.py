@@ -0,0 +1,117 @@
+import asyncio
+import json
+from datetime import datetime
+
+from cachetools import TTLCache
+from sqlalchemy.orm import make_transient_to_detached
+
+from src.auth.models import User
+from src.config import USER_CACHE_SIZE, USER_CACHE_TTL
+from src.database import get_redis_client
+
+USER_INVALIDATION_CHANNEL = "user:invalidate"
+
+# Columns kept for an authenticated principal. The password hash and the
+# relationships are left out, so a cached user can't be used where they are
+# read (password reset, verification, login); those paths load the user from
+# the DB through `CachedUserDatabase.get`.
+USER_CACHE_FIELDS = ("id", "email", "firstname", "lastname", "role_id",
+                     "is_active", "is_superuser", "is_verified", "registered_at")
+
+
+def get_user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def dump_user(user: User) -> dict:
+    fields = {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+    fields["registered_at"] = fields["registered_at"].isoformat() if fields["registered_at"] else None
+    return fields
+
+
+def load_user(fields: dict) -> User:
+    fields = dict(fields)
+    if fields["registered_at"]:
+        fields["registered_at"] = datetime.fromisoformat(fields["registered_at"])
+    user = User(**fields)
+    # Looks like a row loaded earlier by a closed session, so an update merges
+    # it instead of inserting a new user.
+    make_transient_to_detached(user)
+    return user
+
+
+class UserCache:
+    """Resolved users by id, in process (TTL + LRU) and shared through Redis.
+
+    Every write to a user goes through `invalidate`, which drops the Redis
+    copy and tells the other workers to drop theirs over pub/sub.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.ttl = ttl
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._pubsub = None
+        self._listener = None
+
+    async def get(self, user_id: int) -> User | None:
+        fields = self._local.get(user_id)
+        if fields is None:
+            try:
+                raw = await get_redis_client().get(get_user_key(user_id))
+            except Exception as e:
+                print(f"User cache error: {e}")
+                raw = None
+            if raw is None:
+                return None
+            fields = json.loads(raw)
+            self._local[user_id] = fields
+        return load_user(fields)
+
+    async def set(self, user: User):
+        fields = dump_user(user)
+        self._local[user.id] = fields
+        try:
+            await get_redis_client().set(get_user_key(user.id), json.dumps(fields), ex=self.ttl)
+        except Exception as e:
+            print(f"User cache error: {e}")
+
+    async def invalidate(self, user_id: int):
+        self._local.pop(user_id, None)
+        try:
+            redis_client = get_redis_client()
+            await redis_client.delete(get_user_key(user_id))
+            await redis_client.publish(USER_INVALIDATION_CHANNEL, user_id)
+        except Exception as e:
+            print(f"User cache error: {e}")
+
+    async def start(self):
+        self._pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(USER_INVALIDATION_CHANNEL)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+
+    async def _listen(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is not None and message["type"] == "message":
+                    self._local.pop(int(message["data"]), None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"User cache error: {e}")
+                await asyncio.sleep(1)
+
+
+user_cache = UserCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
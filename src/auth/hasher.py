@@ -0,0 +1,74 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from fastapi_users.password import PasswordHelper
+from passlib.context import CryptContext
+
+from src.config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE
+from src.metrics import Counter, Gauge, Histogram
+from src.tracing import span
+
+hash_queue_time = Histogram("password_hash_queue_seconds", "Time a bcrypt job waited for a worker thread")
+hash_run_time = Histogram("password_hash_seconds", "Time spent inside bcrypt hash/verify")
+hash_in_flight = Gauge("password_hash_in_flight", "bcrypt jobs queued or running")
+hash_rejected = Counter("password_hash_rejected_total", "bcrypt jobs refused because the queue was full")
+
+
+class PasswordHasher(PasswordHelper):
+    """Shared bcrypt context whose work runs in a bounded thread pool.
+
+    bcrypt releases the GIL, so hashing in worker threads keeps the event
+    loop (websockets, trades) responsive during a login storm. At most
+    `max_workers` hashes run at once; beyond `max_queue` waiting jobs new
+    requests are refused with a 503 instead of piling up.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int, max_queue: int):
+        super().__init__(context)
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+
+    async def _run(self, func, *args):
+        # In flight counts the running jobs as well as the waiting ones
+        if hash_in_flight.value >= self.max_workers + self.max_queue:
+            hash_rejected.inc()
+            raise HTTPException(status_code=503, detail={"message": "Too many login attempts, try again later"})
+
+        submitted_at = time.perf_counter()
+
+        def timed():
+            started_at = time.perf_counter()
+            hash_queue_time.observe(started_at - submitted_at)
+            try:
+                return func(*args)
+            finally:
+                hash_run_time.observe(time.perf_counter() - started_at)
+
+        hash_in_flight.inc()
+        try:
+            with span("bcrypt", func.__name__):
+                return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            hash_in_flight.dec()
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run(self.hash, password)
+
+    async def verify_async(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update_async(self, password: str, hashed_password: str):
+        return await self._run(self.verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+password_hasher = PasswordHasher(
+    context=CryptContext(schemes=["bcrypt"], deprecated="auto"),
+    max_workers=PASSWORD_HASH_WORKERS,
+    max_queue=PASSWORD_HASH_MAX_QUEUE,
+)
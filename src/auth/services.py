@@ -4,22 +4,21 @@ from typing import Optional, Annotated, Union
 from fastapi import Depends, Request, Form, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users import IntegerIDMixin, BaseUserManager, schemas, exceptions, models
+from fastapi_users.jwt import decode_jwt, generate_jwt
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 from pydantic import EmailStr
 from sqlalchemy import select, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from passlib.context import CryptContext
 import jwt
 
+from src.auth.hasher import password_hasher
 from src.auth.mail_sender import send_email
 from src.auth.models import User, Role
 from src.auth.schemas import RoleCreateSchema, UserCreate, LoginSchema
 from src.auth.utilts import get_user_db
 from src.config import SECRET
-from src.database import async_session_maker
-from src.wallet.services import create__wallet
-from src.wallet.schemas import WalletCreateSchema
+from src.wallet.services import create__wallet__statement
 
 SECRET_KEY = SECRET
 ALGORITHM = "HS256"
@@ -69,11 +68,61 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     reset_password_token_secret = SECRET
     verification_token_secret = SECRET
 
+    async def get_cached(self, id: int) -> User:
+        """Authenticated principal for a request; see `CachedUserDatabase.get_cached`."""
+        user = await self.user_db.get_cached(id)
+        if user is None:
+            raise exceptions.UserNotExists()
+        return user
+
+    # The base manager calls the password helper synchronously, i.e. runs
+    # bcrypt on the event loop, when starting and completing a password reset
+    # and when updating a password; these go through the hasher's pool.
+    async def forgot_password(self, user: User, request: Optional[Request] = None) -> None:
+        if not user.is_active:
+            raise exceptions.UserInactive()
+
+        token_data = {
+            "sub": str(user.id),
+            "password_fgpt": await password_hasher.hash_async(user.hashed_password),
+            "aud": self.reset_password_token_audience,
+        }
+        token = generate_jwt(token_data, self.reset_password_token_secret, self.reset_password_token_lifetime_seconds)
+        await self.on_after_forgot_password(user, token, request)
+
+    async def reset_password(self, token: str, password: str, request: Optional[Request] = None) -> User:
+        try:
+            data = decode_jwt(token, self.reset_password_token_secret, [self.reset_password_token_audience])
+            parsed_id = self.parse_id(data["sub"])
+            password_fingerprint = data["password_fgpt"]
+        except (jwt.PyJWTError, KeyError, exceptions.InvalidID):
+            raise exceptions.InvalidResetPasswordToken()
+
+        user = await self.get(parsed_id)
+
+        valid_password_fingerprint, _ = await password_hasher.verify_and_update_async(
+            user.hashed_password, password_fingerprint
+        )
+        if not valid_password_fingerprint:
+            raise exceptions.InvalidResetPasswordToken()
+
+        if not user.is_active:
+            raise exceptions.UserInactive()
+
+        updated_user = await self._update(user, {"password": password})
+        await self.on_after_reset_password(user, request)
+        return updated_user
+
+    async def _update(self, user: User, update_dict: dict) -> User:
+        update_dict = dict(update_dict)
+        password = update_dict.pop("password", None)
+        if password is not None:
+            await self.validate_password(password, user)
+            update_dict["hashed_password"] = await password_hasher.hash_async(password)
+        return await super()._update(user, update_dict)
+
     async def on_after_register(self, user: User, request: Optional[Request] = None):
         print(f"User {user.id} has registered.")
-        wallet_dict = {"user_id": user.id}
-        wallet_data = WalletCreateSchema(**wallet_dict)
-        await create__wallet(wallet_data=wallet_data)
 
     async def on_after_forgot_password(
             self, user: User, token: str, request: Optional[Request] = None
@@ -109,7 +158,7 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
             user_dict["is_verified"] = True
 
         password = user_dict.pop("password")
-        user_dict["hashed_password"] = self.password_helper.hash(password)
+        user_dict["hashed_password"] = await password_hasher.hash_async(password)
         user_dict["role_id"] = 1
 
         created_user = await self.user_db.create(user_dict)
@@ -125,10 +174,10 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
             user = await self.get_by_email(str(credentials.email))
         except exceptions.UserNotExists:
 
-            self.password_helper.hash(credentials.password)
+            await password_hasher.hash_async(credentials.password)
             return None
 
-        verified, updated_password_hash = self.password_helper.verify_and_update(
+        verified, updated_password_hash = await password_hasher.verify_and_update_async(
             credentials.password, user.hashed_password
         )
         if not verified:
@@ -150,7 +199,7 @@ async def check_user_is_verified(user: User):
         raise HTTPException(status_code=400, detail={"message": "User is not verified"})
 
 
-async def get_user_by_email(email: EmailStr, session: AsyncSession = async_session_maker()):
+async def get_user_by_email(email: EmailStr, session: AsyncSession):
     try:
         query = select(User).where(User.email == email)
         result = await session.execute(query)
@@ -159,8 +208,6 @@ async def get_user_by_email(email: EmailStr, session: AsyncSession = async_sessi
         return user
     except Exception as e:
         print(e)
-    finally:
-        await session.close()
 
 
 async def create_access_token(data: dict):
@@ -179,25 +226,26 @@ async def create_refresh_token(data: dict):
     return encoded_jwt
 
 
-async def register(user: UserCreate, session: AsyncSession = async_session_maker()):
+async def register(user: UserCreate, session: AsyncSession):
     try:
-        pwt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        hashed_password = pwt_context.hash(user.password)
+        hashed_password = await password_hasher.hash_async(user.password)
         user_dict = user.model_dump()
         user_dict.pop("password")
 
-        stmt = insert(User).values(hashed_password=hashed_password, **user_dict)
-        await session.execute(stmt)
+        # User, wallet and opening balance go in as one statement and one commit
+        new_user = (
+            insert(User)
+            .values(hashed_password=hashed_password, registered_at=datetime.now(), **user_dict)
+            .returning(User.id)
+            .cte("new_user")
+        )
+        result = await session.execute(create__wallet__statement(new_user.c.id))
+        user_id, wallet_id = result.one()
         await session.commit()
+        user_dict["id"] = user_id
 
-        user = await get_user_by_email(email=user_dict["email"], session=session)
-        user_dict["id"] = user.id
-
-        token_data = {"sub": user.email}
+        token_data = {"sub": user_dict["email"]}
         access_token = await create_access_token(token_data)
-        wallet_dict = {"user_id": user.id}
-        wallet_data = WalletCreateSchema(**wallet_dict)
-        await create__wallet(wallet_data=wallet_data)
 
         return {"access_token": access_token, "token_type": "bearer"}, user_dict
 
@@ -207,15 +255,13 @@ async def register(user: UserCreate, session: AsyncSession = async_session_maker
         print(e)
 
 
-async def login(login_data: LoginSchema, session: AsyncSession = async_session_maker()):
+async def login(login_data: LoginSchema, session: AsyncSession):
     try:
         email = login_data.email
         password = login_data.password
         user = await get_user_by_email(email=email, session=session)
 
-        pwt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-        if not pwt_context.verify(password, user.hashed_password):
+        if not await password_hasher.verify_async(password, user.hashed_password):
             raise HTTPException(status_code=400, detail={"message": "Invalid credentials"})
 
         token_data = {"sub": user.email}
@@ -229,10 +275,10 @@ async def login(login_data: LoginSchema, session: AsyncSession = async_session_m
 
 
 async def get_user_manager(user_db: SQLAlchemyUserDatabase = Depends(get_user_db)):
-    yield UserManager(user_db)
+    yield UserManager(user_db, password_helper=password_hasher)
 
 
-async def create__role(user_id: int, role_data: RoleCreateSchema, session: AsyncSession = async_session_maker()):
+async def create__role(user_id: int, role_data: RoleCreateSchema, session: AsyncSession):
     async with session.begin():
         user_is_superuser = select(User.is_superuser).where(User.id == user_id).scalar_subquery()
 
@@ -244,7 +290,7 @@ async def create__role(user_id: int, role_data: RoleCreateSchema, session: Async
         await session.commit()
 
 
-async def get__role(user_id: int, session: AsyncSession = async_session_maker()):
+async def get__role(user_id: int, session: AsyncSession):
     async with session.begin():
         user_is_superuser = select(User.is_superuser).where(User.id == user_id).scalar_subquery()
 
@@ -256,7 +302,7 @@ async def get__role(user_id: int, session: AsyncSession = async_session_maker())
 
 
 # Only for DEVs
-async def create__default__role(session: AsyncSession = async_session_maker()):
+async def create__default__role(session: AsyncSession):
     async with session.begin():
 
         role_data = {
@@ -1,10 +1,60 @@
 from fastapi import Depends
+from fastapi_users import exceptions
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.auth.cache import user_cache
 from src.auth.models import User, OAuthAccount
 from src.database import get_async_session
+from src.wallet.services import create__wallet__statement
+
+
+class CachedUserDatabase(SQLAlchemyUserDatabase):
+    """The JWT lookup every authenticated request does goes through
+    `get_cached`, served from `user_cache`; writes invalidate it.
+
+    `get` still reads the full row, because the manager's password reset,
+    verification and update paths need the password hash.
+    """
+
+    async def create(self, create_dict):
+        # The wallet and its opening balance are created in the same
+        # transaction as the user, for both password and OAuth sign-ups.
+        user = self.user_table(**create_dict)
+        self.session.add(user)
+        await self.session.flush()
+        await self.session.execute(create__wallet__statement(user.id))
+        await self.session.commit()
+        await self.session.refresh(user)
+        return user
+
+    async def get_cached(self, id):
+        user = await user_cache.get(id)
+        if user is None:
+            user = await super().get(id)
+            if user is not None:
+                await user_cache.set(user)
+        return user
+
+    # `user` may be a cached snapshot. Merging it would write back every
+    # column as cached, e.g. reverting an admin's is_active change whose
+    # invalidation was missed, so the changes go to the stored row instead.
+    async def update(self, user, update_dict):
+        user_id = user.id
+        user = await self.get(user_id)
+        if user is None:
+            raise exceptions.UserNotExists()
+        user = await super().update(user, update_dict)
+        await user_cache.invalidate(user_id)
+        return user
+
+    async def delete(self, user):
+        user_id = user.id
+        user = await self.get(user_id)
+        if user is not None:
+            await super().delete(user)
+        await user_cache.invalidate(user_id)
 
 
 async def get_user_db(session: AsyncSession = Depends(get_async_session)):
-    yield SQLAlchemyUserDatabase(session, User, OAuthAccount)
+    yield CachedUserDatabase(session, User, OAuthAccount)
@@ -10,6 +10,17 @@ DB_NAME = os.environ.get("DB_NAME")
 DB_USER = os.environ.get("DB_USER")
 DB_PASS = os.environ.get("DB_PASS")
 
+# SQLAlchemy engine pool and asyncpg prepared statement cache
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 100))
+# Attempts for a trade that hits a deadlock or serialization failure
+TRADE_MAX_ATTEMPTS = int(os.environ.get("TRADE_MAX_ATTEMPTS", 3))
+# Orders accepted in one batch request, all applied under one set of row locks
+BATCH_MAX_ORDERS = int(os.environ.get("BATCH_MAX_ORDERS", 50))
+
 #0auth
 SECRET = os.environ.get("SECRET")
 
@@ -17,6 +28,23 @@ GOOGLE_CLIENT_ID = str(os.environ.get("GOOGLE_CLIENT_ID"))
 
 GOOGLE_CLIENT_SECRET = str(os.environ.get("GOOGLE_CLIENT_SECRET"))
 
+# bcrypt runs in a thread pool of this size; logins beyond the queue limit get a 503
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 4))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", 64))
+
+# Authenticated-user cache: in-process LRU size and TTL (also used for the Redis copy)
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 60))
+
+# Request tracing: recent traces kept in memory, optionally appended to a
+# JSON-lines file; the sampling profiler is opt-in and keeps the slowest requests
+TRACE_BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE", 200))
+TRACE_FILE = os.environ.get("TRACE_FILE")
+PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED", "false").lower() == "true"
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.005))
+PROFILE_SLOWEST = int(os.environ.get("PROFILE_SLOWEST", 20))
+PROFILE_FILE = os.environ.get("PROFILE_FILE")
+
 #Google mail sender API
 MAIL_HOST = os.environ.get("MAIL_HOST")
 MAIL_EMAIL = os.environ.get("MAIL_EMAIL")
@@ -25,62 +53,41 @@ MAIL_PORT = os.environ.get("MAIL_PORT")
 
 #Binance and other similar API
 BINANCE_WEBSOCKET_ALL_COINS_URL = str(os.environ.get("BINANCE_WEBSOCKET_ALL_COINS_URL"))
+# When the Redis writer flushes the latest tickers: after this many distinct
+# symbols are pending or this many seconds
+INGEST_FLUSH_SIZE = int(os.environ.get("INGEST_FLUSH_SIZE", 500))
+INGEST_FLUSH_INTERVAL = float(os.environ.get("INGEST_FLUSH_INTERVAL", 0.1))
 
 RS_HOST = str(os.environ.get("RS_HOST"))
 RS_PORT = str(os.environ.get("RS_PORT"))
 
 REDIS_URL = f"redis://{RS_HOST}:{RS_PORT}"
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 100))
+REDIS_POOL_TIMEOUT = float(os.environ.get("REDIS_POOL_TIMEOUT", 5))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.environ.get("REDIS_SOCKET_CONNECT_TIMEOUT", 2))
 
 CURRENCY_CACHE_TIME = str(os.environ.get("CURRENCY_CACHE_TIME"))
+# Maximum number of ticks kept per symbol in its history sorted set
+TICK_HISTORY_MAX_LEN = int(os.environ.get("TICK_HISTORY_MAX_LEN", 3600))
+# Upper bound on price pushes per second to a single websocket client
+WS_MAX_UPDATE_RATE = float(os.environ.get("WS_MAX_UPDATE_RATE", 2))
+# Per-connection outbound queue size, and how long a client may keep
+# overflowing it (or block a single send) before it is disconnected
+WS_QUEUE_SIZE = int(os.environ.get("WS_QUEUE_SIZE", 256))
+WS_SLOW_CONSUMER_TIMEOUT = float(os.environ.get("WS_SLOW_CONSUMER_TIMEOUT", 10))
+WS_SEND_TIMEOUT = float(os.environ.get("WS_SEND_TIMEOUT", 5))
+# Number of OHLCV candles kept per symbol for each resolution
+CANDLE_RETENTION = {
+    "1m": int(os.environ.get("CANDLE_RETENTION_1M", 1440)),
+    "5m": int(os.environ.get("CANDLE_RETENTION_5M", 2016)),
+    "1h": int(os.environ.get("CANDLE_RETENTION_1H", 720)),
+    "1d": int(os.environ.get("CANDLE_RETENTION_1D", 365)),
+}
+# Seconds an in-process price stays valid before trades fall back to Redis
+PRICE_CACHE_MAX_AGE = float(os.environ.get("PRICE_CACHE_MAX_AGE", 5))
 
-BINANCE_USDT_PAIRS_LIST = [
-    "DASHUSDT", "MAGICUSDT", "OGUSDT", "TRXUSDT", "CREAMUSDT", "HIVEUSDT", "AGLDUSDT",
-    "ACHUSDT", "SKLUSDT", "SEIUSDT", "BELUSDT", "ETHUPUSDT", "IDEXUSDT", "LDOUSDT", "CHESSUSDT",
-    "DARUSDT", "EURUSDT", "ENSUSDT", "NMRUSDT", "WAVESUSDT", "NEARUSDT", "KDAUSDT", "ELFUSDT",
-    "TIAUSDT", "FIROUSDT", "ETHDOWNUSDT", "RADU", "HIFIUSDT", "CVCUSDT", "WRXUSDT", "IOTXUSDT",
-    "AVAXUSDT", "HBARUSDT", "LSK", "MULTI", "IOTA", "ZRXUSDT", "RSRUSDT", "GNOUSDT",
-    "UNIUSDT", "ASTRUSDT", "WLD", "ARKM", "JOEUSDT", "COTIUSDT", "KEYUSDT", "OMUSDT",
-    "QTUMUSDT", "NULSUSDT", "TRY", "WING", "IRISUSDT", "LITUSDT", "BETAUSDT", "HIGHUSDT",
-    "VGXUSDT", "ORDIUSDT", "LEVERUSDT", "GMTUSDT", "DOGEUSDT", "PNTUSDT", "SYNUSDT", "SUPERUSDT",
-    "ACEUSDT", "OXTUSDT", "MATICUSDT", "USDTNGN", "ERNUSDT", "MKRUSDT", "MEMEUSDT", "FXSUSDT",
-    "ORNUSDT", "IQUSDT", "ENJUSDT", "XVSUSDT", "APEUSDT", "STGUSDT", "LQTYUSDT", "ALPHAUSDT",
-    "FARMUSDT", "MOVRUSDT", "ALCXUSDT", "GRTUSDT", "OAXUSDT", "TKOUSDT", "BADGERUSDT", "ONEUSDT",
-    "RVNUSDT", "PAXGUSDT", "SANTOSUSDT", "EDUUSDT", "DUSKUSDT", "LINAUSDT", "DOCKUSDT", "MDTUSDT",
-    "XEMUSDT", "STPTUSDT", "ARDRUSDT", "BCHUSDT", "FDUSDUSDT", "REEFUSDT", "OGNUSDT", "ICXUSDT",
-    "FLMUSDT", "DOTUSDT", "DYDXUSDT", "WNXMUSDT", "FORTHUSDT", "HFTUSDT", "USDTARS", "AMPUSDT",
-    "VIDTUSDT", "PYRUSDT", "MBLUSDT", "TLMUSDT", "BNXUSDT", "MBOXUSDT", "CELRUSDT", "BNBUPUSDT",
-    "JUVUSDT", "CLVUSDT", "1INCHUSDT", "PHAUSDT", "AUCTIONUSDT", "VIBUSDT", "USDTRON", "ACAUSDT",
-    "HOOKUSDT", "BALUSDT", "QUICKUSDT", "BTCDOWNUSDT", "OPUSDT", "CTXCUSDT", "SYSUSDT", "XMRUSDT",
-    "WINUSDT", "COSUSDT", "POLSUSDT", "RENUSDT", "PONDUSDT", "LINKUSDT", "RAYUSDT", "NEXOUSDT",
-    "SSVUSDT", "WBTCUSDT", "DIAUSDT", "BEAMXUSDT", "WBETHUSDT", "FLOWUSDT", "CRVUSDT", "THETAUSDT",
-    "UTKUSDT", "VTHOUSDT", "FLUXUSDT", "GLMRUSDT", "SCRTUSDT", "USDTZAR", "PERPUSDT", "PIVXUSDT",
-    "USDTIDRT", "ARBUSDT", "FORUSDT", "DENTUSDT", "SHIBUSDT", "MDXUSDT", "PSGUSDT", "CFXUSDT",
-    "ICPUSDT", "CTKUSDT", "FETUSDT", "SUSHIUSDT", "FILUSDT", "API3USDT", "NTRNUSDT", "VANRYUSDT",
-    "RNDRUSDT", "BAKEUSDT", "ALPINEUSDT", "SFPUSDT", "SNXUSDT", "PROSUSDT", "STEEMUSDT", "BICOUSDT",
-    "USDPUSDT", "FUNUSDT", "FLOKIUSDT", "DATAUSDT", "NEOUSDT", "STXUSDT", "GMXUSDT", "LOOMUSDT",
-    "CELOUSDT", "KP3RUSDT", "GTCUSDT", "BTTCUSDT", "LTCUSDT", "PUNDIXUSDT", "IMXUSDT", "DFUSDT",
-    "SCUSDT", "USDTDAI", "LPTUSDT", "GNSUSDT", "FIDAUSDT", "RDNTUSDT", "ANKRUSDT", "BANDUSDT",
-    "TUSDUSDT", "OSMOUSDT", "RUNEUSDT", "CVXUSDT", "GALAUSDT", "DGBUSDT", "HARDUSDT", "KNCUSDT",
-    "PEOPLEUSDT", "EPXUSDT", "ONGUSDT", "GHSTUSDT", "MTLUSDT", "GLMUSDT", "POWRUSDT", "ATMUSDT",
-    "TWTUSDT", "LAZIOUSDT", "CHZUSDT", "COMPUSDT", "DREPUSDT", "RLCUSDT", "BNBUSDT", "TROYUSDT",
-    "SPELLUSDT", "KSMUSDT", "VETUSDT", "QNTUSDT", "RAREUSDT", "REQUSDT", "ALICEUSDT", "EGLDUSDT",
-    "WANUSDT", "OCEANUSDT", "MAVUSDT", "FDUSDTRY", "ASRUSDT", "JSTUSDT", "PEPEUSDT", "COMBOUSDT",
-    "OMGUSDT", "INJUSDT", "BNTUSDT", "BARUSDT", "STORJUSDT", "GBPUSDT", "FISUSDT", "C98USDT",
-    "ARPAUSDT", "AXSUSDT", "SOLUSDT", "1000SATSUSDT", "QIUSDT", "CYBERUSDT", "USDCUSDT", "UNFIUSDT",
-    "ARUSDT", "PORTOUSDT", "KAVAUSDT", "DCRUSDT", "XNOUSDT", "ASTUSDT", "LOKAUSDT", "USDTUAH",
-    "ATOMUSDT", "MLNUSDT", "USDTRUB", "AGIXUSDT", "USDTBIDR", "VICUSDT", "VITEUSDT", "BONDUSDT",
-    "POLYXUSDT", "FIOUSDT", "SUIUSDT", "MASKUSDT", "XRPUSDT", "FTMUSDT", "LTOUSDT", "FTTUSDT",
-    "WOOUSDT", "MANAUSDT", "BTCUSDT", "BONKUSDT", "BLURUSDT", "ADXUSDT", "ATAUSDT", "BATUSDT",
-    "AVAUSDT", "SANDUSDT", "MINAUSDT", "ALPACAUSDT", "SXPUSDT", "ONTUSDT", "ETCUSDT", "BNBDOWNUSDT",
-    "NKNUSDT", "CHRUSDT", "CKBUSDT", "SLPUSDT", "LRCUSDT", "USDTPLN",  "REIUSDT", "LUNCUSDT",
-    "UMAUSDT", "QKCUSDT", "XLMUSDT", "ARKUSDT", "SUNUSDT", "VOXELUSDT", "YFIUSDT", "BLZUSDT",
-    "GALUSDT", "ACMUSDT", "WAXPUSDT", "TFUELUSDT", "SNTUSDT", "OOKIUSDT", "CAKEUSDT", "PROMUSDT",
-    "TRUUSDT", "JASMYUSDT", "ROSEUSDT", "USTCUSDT", "DEGOUSDT", "FRONTUSDT", "CTSIUSDT", "PHBUSDT",
-    "ILVUSDT", "ETHUSDT", "AMBUSDT", "USDTTRY", "MOBUSDT", "TRBUSDT", "AEURUSDT", "YGGUSDT", "CVPUSDT",
-    "XVGUSDT", "BIFIUSDT", "KMDUSDT", "GASUSDT", "ADAUSDT", "PLAUSDT", "AUDIOUSDT", "USDTBRL",
-    "TUSDT", "IOSTUSDT", "DEXEUSDT", "ALGOUSDT", "KLAYUSDT", "JTOUSDT", "DODOUSDT", "PENDLEUSDT",
-    "BSWUSDT", "APTUSDT", "RPLUSDT", "RIFUSDT", "HOTUSDT", "UFTUSDT", "EOSUSDT", "ZENUSDT", "BTCUPUSDT",
-    "ZECUSDT", "GFTUSDT", "STRAXUSDT", "XTZUSDT", "ZILUSDT", "AAVEUSDT", "STMXUSDT", "LUNAUSDT",
-    "IDUSDT", "XECUSDT", "ANTUSDT", "AKROUSDT", "AERGOUSDT", "AERGOUSDT", "CITYUSDT", "BURGERUSDT"]
-
-BINANCE_CURRENCY_LIST = [el.replace("USDT", "") for el in BINANCE_USDT_PAIRS_LIST]
+# Binance exchangeInfo-style JSON listing the tradable pairs, re-read when it changes
+SYMBOLS_FILE = os.environ.get(
+    "SYMBOLS_FILE", os.path.join(os.path.dirname(__file__), "wallet", "data", "exchange_info.json"))
+SYMBOLS_RELOAD_INTERVAL = float(os.environ.get("SYMBOLS_RELOAD_INTERVAL", 300))
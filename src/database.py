@@ -1,21 +1,75 @@
-from typing import AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator
 
+import aioredis
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import DeclarativeMeta, declarative_base
 
-from src.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER, RS_HOST, RS_PORT
-# from redis import StrictRedis
+from src.config import (DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                        DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE, REDIS_URL, REDIS_MAX_CONNECTIONS,
+                        REDIS_POOL_TIMEOUT, REDIS_SOCKET_TIMEOUT, REDIS_SOCKET_CONNECT_TIMEOUT)
+from src.tracing import TracedRedis, instrument_engine
 
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 Base: DeclarativeMeta = declarative_base()
 
 
-engine = create_async_engine(DATABASE_URL)
+engine = create_async_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args={"statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+)
+instrument_engine(engine)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
-# redis_client = StrictRedis(host=RS_HOST, port=RS_PORT, db=0, encoding="utf-8", decode_responses=True)
+# One pooled client per process, created on app startup and shared by the
+# price lookups, the Binance ingestion loop and the websocket streams.
+redis_client: aioredis.Redis | None = None
 
 
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    """One session per unit of work (a request, a background task, a script).
+
+    Service functions never create or close sessions themselves; they all
+    run on the session handed to them from here.
+    """
     async with async_session_maker() as session:
         yield session
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with session_scope() as session:
+        yield session
+
+
+async def init_redis_pool() -> aioredis.Redis:
+    global redis_client
+    if redis_client is None:
+        pool = aioredis.BlockingConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+            decode_responses=True,
+        )
+        redis_client = TracedRedis(connection_pool=pool)
+    return redis_client
+
+
+async def close_redis_pool():
+    global redis_client
+    if redis_client is not None:
+        await redis_client.close()
+        await redis_client.connection_pool.disconnect()
+        redis_client = None
+
+
+def get_redis_client() -> aioredis.Redis:
+    if redis_client is None:
+        raise RuntimeError("Redis pool is not initialised, call init_redis_pool() on startup")
+    return redis_client
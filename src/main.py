@@ -1,14 +1,25 @@
 import asyncio
 import uvicorn
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Query
 from starlette.middleware.cors import CORSMiddleware
-from starlette.responses import HTMLResponse
+from starlette.responses import HTMLResponse, Response
 from websockets.exceptions import ConnectionClosed
 
+from src.auth.base_config import fastapi_users
+from src.auth.cache import user_cache
+from src.auth.hasher import password_hasher
 from src.auth.routers import auth_router
-from src.wallet.services import WebSocket, get_currency_data, get_currency_data_from_redis
+from src.database import init_redis_pool, close_redis_pool
+from src.wallet.services import (WebSocket, get_currency_data, get_currency_data_from_redis, get__candles,
+                                 get__price__history)
 from src.wallet.routers import wallet_router
+from src.wallet.hub import price_hub
+from src.wallet.symbols import symbol_registry
+from src.wallet.stream import stream_currency_data
+from src.config import WS_MAX_UPDATE_RATE, PROFILE_ENABLED, PROFILE_FILE
+from src.metrics import CONTENT_TYPE, render
+from src.tracing import TracingMiddleware, profiler, recent_traces, trace_writer
 
 app = FastAPI(
     title="Crypta"
@@ -27,6 +38,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(TracingMiddleware)
 
 # Auth endpoint
 app.include_router(
@@ -48,12 +60,48 @@ async def root():
     return {'message': 'Hello it\'s main_app'}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=render(), media_type=CONTENT_TYPE)
+
+
+current_superuser = fastapi_users.current_user(active=True, superuser=True)
+
+
+@app.get("/debug/traces", include_in_schema=False, dependencies=[Depends(current_superuser)])
+async def debug_traces(min_duration: float = 0):
+    return [trace.as_dict() for trace in recent_traces if trace.duration >= min_duration]
+
+
+@app.get("/debug/profile", include_in_schema=False, dependencies=[Depends(current_superuser)])
+async def debug_profile():
+    return Response(content=profiler.folded(), media_type="text/plain")
+
+
 @app.websocket("/ws/coin/price/")
 async def get_currency_data_(currency: str, websocket: WebSocket):
     await websocket.accept()
     await get_currency_data_from_redis(currency=currency, websocket=websocket)
 
 
+@app.websocket("/ws/coin/prices/")
+async def stream_currency_data_(websocket: WebSocket, rate: float = WS_MAX_UPDATE_RATE):
+    await websocket.accept()
+    await stream_currency_data(websocket=websocket, rate=rate)
+
+
+@app.get("/coin/candles", tags=["API"])
+async def get_candles_(symbol: str, resolution: str = "1m", start: int | None = None, end: int | None = None,
+                       limit: int = Query(500, ge=1, le=5000)):
+    return await get__candles(symbol=symbol, resolution=resolution, start=start, end=end, limit=limit)
+
+
+@app.get("/coin/history", tags=["API"])
+async def get_price_history_(symbol: str, start: int | None = None, end: int | None = None,
+                             points: int = Query(500, ge=3, le=5000)):
+    return await get__price__history(symbol=symbol, start=start, end=end, points=points)
+
+
 @app.get("/coin/price/get/", tags=["API"])
 def read_root(currency: str):
     return HTMLResponse(
@@ -98,6 +146,12 @@ async def startup_event():
 
 @app.on_event("startup")
 async def on_startup():
+    if PROFILE_ENABLED:
+        profiler.start()
+    await init_redis_pool()
+    await price_hub.start()
+    await user_cache.start()
+    asyncio.create_task(symbol_registry.watch())
     try:
         asyncio.create_task(get_currency_data())
     except ConnectionClosed as e:
@@ -108,5 +162,19 @@ async def on_startup():
         print(f"Error during startup: {e}")
         asyncio.create_task(get_currency_data())
 
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await price_hub.stop()
+    await user_cache.stop()
+    await close_redis_pool()
+    password_hasher.shutdown()
+    trace_writer.shutdown(wait=True)
+    if PROFILE_ENABLED:
+        profiler.stop()
+        if PROFILE_FILE:
+            with open(PROFILE_FILE, "w") as file:
+                file.write(profiler.folded())
+
 if __name__ == "__main__":
     uvicorn.run(app, port=8080, reload=True)
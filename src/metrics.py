@@ -0,0 +1,126 @@
+REGISTRY = []
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        REGISTRY.append(self)
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+
+class Histogram:
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name: str, documentation: str, buckets: tuple = DEFAULT_BUCKETS, registry: list | None = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0
+        self.count = 0
+        if registry is not None:
+            registry.append(self)
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class LabeledGauge:
+    """Gauge with one label whose values are read from `collect` at scrape time."""
+
+    def __init__(self, name: str, documentation: str, label: str, collect):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.collect = collect
+        REGISTRY.append(self)
+
+
+class LabeledHistogram:
+    """Histogram with one label; `labels(value)` returns the child histogram for a value."""
+
+    def __init__(self, name: str, documentation: str, label: str, buckets: tuple = Histogram.DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self.children: dict[str, Histogram] = {}
+        REGISTRY.append(self)
+
+    def labels(self, value: str) -> Histogram:
+        child = self.children.get(value)
+        if child is None:
+            child = self.children[value] = Histogram(self.name, self.documentation, self.buckets, registry=None)
+        return child
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        if isinstance(metric, Counter):
+            lines.append(f"# TYPE {metric.name} counter")
+            lines.append(f"{metric.name} {format_value(metric.value)}")
+        elif isinstance(metric, Gauge):
+            lines.append(f"# TYPE {metric.name} gauge")
+            lines.append(f"{metric.name} {format_value(metric.value)}")
+        elif isinstance(metric, LabeledGauge):
+            lines.append(f"# TYPE {metric.name} gauge")
+            for label_value, value in metric.collect().items():
+                lines.append(f'{metric.name}{{{metric.label}="{label_value}"}} {format_value(value)}')
+        elif isinstance(metric, Histogram):
+            lines.append(f"# TYPE {metric.name} histogram")
+            lines.extend(render_histogram(metric))
+        elif isinstance(metric, LabeledHistogram):
+            lines.append(f"# TYPE {metric.name} histogram")
+            for label_value, child in list(metric.children.items()):
+                lines.extend(render_histogram(child, f'{metric.label}="{label_value}",'))
+    return "\n".join(lines) + "\n"
+
+
+def render_histogram(histogram: Histogram, labels: str = "") -> list[str]:
+    lines = []
+    # Buckets are stored per interval; Prometheus wants them cumulative
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{histogram.name}_bucket{{{labels}le="{format_value(bound)}"}} {cumulative}')
+    lines.append(f'{histogram.name}_bucket{{{labels}le="+Inf"}} {histogram.count}')
+    suffix = f"{{{labels.rstrip(',')}}}" if labels else ""
+    lines.append(f"{histogram.name}_sum{suffix} {format_value(histogram.sum)}")
+    lines.append(f"{histogram.name}_count{suffix} {histogram.count}")
+    return lines
@@ -0,0 +1,248 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import aioredis
+from aioredis.client import Pipeline
+from sqlalchemy import event
+
+from src.config import TRACE_BUFFER_SIZE, TRACE_FILE, PROFILE_ENABLED, PROFILE_INTERVAL, PROFILE_SLOWEST
+from src.metrics import LabeledHistogram
+
+request_latency = LabeledHistogram("http_request_duration_seconds", "HTTP request latency", "route")
+span_latency = LabeledHistogram("http_request_span_seconds", "Time requests spent in SQL, Redis and bcrypt", "kind")
+
+
+class RequestTrace:
+    """Timeline of one HTTP request: its SQL, Redis and bcrypt spans, plus profiler samples."""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.route = path
+        self.status = None
+        self.timestamp = time.time()
+        self.started_at = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.stacks = StackCounter()
+
+    def add_span(self, kind: str, name: str, started_at: float):
+        duration = time.perf_counter() - started_at
+        self.spans.append({"kind": kind, "name": name, "offset": started_at - self.started_at, "duration": duration})
+        span_latency.labels(kind).observe(duration)
+
+    def finish(self, route):
+        self.duration = time.perf_counter() - self.started_at
+        # Unmatched paths are grouped so 404 scans can't blow up the label set
+        self.route = route.path if route is not None else "<unmatched>"
+
+    def as_dict(self) -> dict:
+        breakdown = {}
+        for span in self.spans:
+            breakdown[span["kind"]] = breakdown.get(span["kind"], 0) + span["duration"]
+        # Spans of concurrent awaits can overlap, so this is a lower bound
+        breakdown["python"] = max(self.duration - sum(breakdown.values()), 0)
+        return {
+            "method": self.method,
+            "route": self.route,
+            "status": self.status,
+            "timestamp": self.timestamp,
+            "duration": self.duration,
+            "breakdown": breakdown,
+            "spans": self.spans,
+        }
+
+
+current_trace: ContextVar[RequestTrace | None] = ContextVar("current_trace", default=None)
+recent_traces: deque[RequestTrace] = deque(maxlen=TRACE_BUFFER_SIZE)
+# One thread, so trace lines are appended in order and never interleave
+trace_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-writer")
+
+
+@contextmanager
+def span(kind: str, name: str):
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(kind, name, started_at)
+
+
+def instrument_engine(engine):
+    """Record a span for every statement run on `engine` inside a traced request."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("trace_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record_statement(conn, statement)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(context):
+        # A failed statement never reaches after_cursor_execute
+        if context.execution_context is not None and context.connection is not None:
+            record_statement(context.connection, context.statement)
+
+
+def record_statement(conn, statement: str):
+    pending = conn.info.get("trace_started_at")
+    if not pending:
+        return
+    started_at = pending.pop()
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_span("sql", " ".join(statement.split())[:200], started_at)
+
+
+class TracedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        with span("redis", f"PIPELINE ({len(self)} commands)"):
+            return await super().execute(raise_on_error)
+
+
+class TracedRedis(aioredis.Redis):
+    """Redis client that records a span for each command and pipeline."""
+
+    async def execute_command(self, *args, **options):
+        with span("redis", str(args[0])):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> TracedPipeline:
+        return TracedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack and charges it to the running request.
+
+    A background thread wakes every `interval` seconds, walks the loop
+    thread's current stack and, if a traced request's middleware frame is on
+    it, counts the stack against that request. The `keep` slowest requests
+    are retained and can be dumped as folded stacks for flamegraph.pl or
+    speedscope.
+    """
+
+    def __init__(self, interval: float, keep: int):
+        self.interval = interval
+        self.keep = keep
+        self._active: dict = {}
+        self._slowest: list = []
+        self._sequence = itertools.count()
+        self._thread = None
+        self._thread_id = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def begin(self, frame, trace: RequestTrace):
+        self._active[frame] = trace
+
+    def end(self, frame, trace: RequestTrace):
+        self._active.pop(frame, None)
+        if not trace.stacks:
+            return
+        entry = (trace.duration, next(self._sequence), trace)
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, entry)
+        elif entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def folded(self) -> str:
+        lines = []
+        for duration, _, trace in sorted(self._slowest, reverse=True):
+            root = f"{trace.method} {trace.route} {duration * 1000:.0f}ms"
+            for stack, count in trace.stacks.items():
+                lines.append(f"{root};{stack} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._sample(frame)
+
+    def _sample(self, frame):
+        stack = []
+        trace = None
+        while frame is not None:
+            if trace is None:
+                trace = self._active.get(frame)
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if trace is not None:
+            trace.stacks[";".join(reversed(stack))] += 1
+
+
+class TracingMiddleware:
+    """Times every HTTP request per route and keeps its span breakdown.
+
+    Finished traces go to `recent_traces`, and to TRACE_FILE as JSON lines
+    when it is set. With PROFILE_ENABLED the sampling profiler also runs.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope["method"], scope["path"])
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+            await send(message)
+
+        token = current_trace.set(trace)
+        frame = sys._getframe()
+        if PROFILE_ENABLED:
+            profiler.begin(frame, trace)
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            current_trace.reset(token)
+            trace.finish(scope.get("route"))
+            request_latency.labels(f"{trace.method} {trace.route}").observe(trace.duration)
+            recent_traces.append(trace)
+            if PROFILE_ENABLED:
+                profiler.end(frame, trace)
+            if TRACE_FILE:
+                asyncio.get_running_loop().run_in_executor(trace_writer, write_trace, TRACE_FILE, trace.as_dict())
+
+
+def write_trace(path: str, record: dict):
+    try:
+        with open(path, "a") as file:
+            file.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"Trace export error: {e}")
+
+
+profiler = SamplingProfiler(interval=PROFILE_INTERVAL, keep=PROFILE_SLOWEST)
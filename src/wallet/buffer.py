@@ -0,0 +1,44 @@
+import asyncio
+
+
+class TickerBuffer:
+    """Newest not-yet-written ticker per symbol, between the Binance receiver and the Redis writer.
+
+    The receiver merges every frame in as it arrives, so the buffer never
+    holds more than one entry per symbol and a slow writer costs only
+    intermediate prices, never a symbol's latest one. `take` waits for data
+    and hands back everything pending once `size` symbols have accumulated
+    or `interval` seconds have passed since the first of them arrived.
+    """
+
+    def __init__(self):
+        self._pending: dict[str, dict] = {}
+        self._arrived = asyncio.Event()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def merge(self, tickers):
+        for ticker in tickers:
+            current = self._pending.get(ticker["s"])
+            if current is None or ticker["E"] >= current["E"]:
+                self._pending[ticker["s"]] = ticker
+        if self._pending:
+            self._arrived.set()
+
+    async def take(self, size: int, interval: float) -> list[dict]:
+        await self._arrived.wait()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + interval
+        while len(self._pending) < size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+        pending, self._pending = self._pending, {}
+        self._arrived.clear()
+        return list(pending.values())
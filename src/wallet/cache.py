@@ -0,0 +1,36 @@
+import time
+from decimal import Decimal
+
+
+class PriceCache:
+    """Last close price per symbol, kept in process memory.
+
+    The Binance ingestion loop writes every frame into it, so trades can read
+    a price without a Redis round-trip. Ages are measured from the ticker's
+    event time rather than from when it was stored, so a price read back from
+    Redis after the feed died is no fresher than the feed itself; entries
+    older than `max_age` seconds are treated as missing.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self._prices: dict[str, tuple[Decimal, int]] = {}
+
+    def is_fresh(self, event_time: int) -> bool:
+        # Binance event times are in milliseconds
+        return time.time() - event_time / 1000 <= self.max_age
+
+    def set(self, symbol: str, price: Decimal, event_time: int):
+        self._prices[symbol] = (price, event_time)
+
+    def update(self, prices: dict[str, tuple[Decimal, int]]):
+        self._prices.update(prices)
+
+    def get(self, symbol: str) -> Decimal | None:
+        entry = self._prices.get(symbol)
+        if entry is None:
+            return None
+        price, event_time = entry
+        if not self.is_fresh(event_time):
+            return None
+        return price
@@ -0,0 +1,120 @@
+import json
+from decimal import Decimal
+
+from src.config import CANDLE_RETENTION
+
+# Candle width per resolution, in milliseconds (Binance event times are ms)
+RESOLUTIONS = {"1m": 60_000, "5m": 300_000, "1h": 3_600_000, "1d": 86_400_000}
+CANDLE_FIELDS = ("t", "o", "h", "l", "c", "v")
+
+
+def get_candle_key(symbol: str, resolution: str) -> str:
+    return f"candles:{resolution}:{symbol}"
+
+
+def encode_candle(candle: list) -> str:
+    open_time, *values = candle
+    return json.dumps([open_time, *(str(value) for value in values)], separators=(",", ":"))
+
+
+def decode_candle(raw: str | bytes) -> dict:
+    return dict(zip(CANDLE_FIELDS, json.loads(raw)))
+
+
+def load_candle(raw: str | bytes) -> list:
+    open_time, *values = json.loads(raw)
+    return [open_time, *(Decimal(value) for value in values)]
+
+
+class CandleBuilder:
+    """Open candles per symbol and resolution, updated tick by tick.
+
+    `update` folds a ticker into the current 1m/5m/1h/1d candles and returns
+    the ones that changed, ready to be written over their previous version in
+    Redis, each flagged with whether it was just opened. The !ticker@arr stream only carries a rolling 24h volume, so a
+    candle's volume is the sum of the increases of that figure seen during it.
+
+    A symbol's open candles are seeded from Redis (`seed`) before its first
+    update in this process, so a restart carries on with the stored
+    open/high/low/volume instead of overwriting them.
+    """
+
+    def __init__(self):
+        self._candles: dict[tuple[str, str], list] = {}
+        self._volumes: dict[str, Decimal] = {}
+        self._seeded: set[str] = set()
+
+    def unseeded(self, symbols) -> list[str]:
+        return [symbol for symbol in symbols if symbol not in self._seeded]
+
+    def seed(self, symbol: str, stored: dict[str, list | None]):
+        for resolution, candle in stored.items():
+            if candle is not None:
+                self._candles.setdefault((symbol, resolution), candle)
+        self._seeded.add(symbol)
+
+    def update(self, ticker: dict) -> list[tuple[str, list, bool]]:
+        symbol = ticker["s"]
+        event_time = ticker["E"]
+        price = Decimal(ticker["c"])
+        volume = Decimal(ticker["v"])
+        previous_volume = self._volumes.get(symbol, volume)
+        traded = max(volume - previous_volume, Decimal(0))
+        self._volumes[symbol] = volume
+
+        changed = []
+        for resolution, width in RESOLUTIONS.items():
+            open_time = event_time - event_time % width
+            candle = self._candles.get((symbol, resolution))
+            opened = candle is None or open_time > candle[0]
+            if opened:
+                candle = [open_time, price, price, price, price, traded]
+                self._candles[(symbol, resolution)] = candle
+            elif open_time < candle[0]:
+                # Late tick for a candle that is already closed
+                continue
+            elif price == candle[4] and not traded:
+                continue
+            else:
+                candle[2] = max(candle[2], price)
+                candle[3] = min(candle[3], price)
+                candle[4] = price
+                candle[5] += traded
+            changed.append((resolution, candle, opened))
+        return changed
+
+
+def write_candle(pipe, symbol: str, resolution: str, candle: list, opened: bool):
+    key = get_candle_key(symbol, resolution)
+    open_time = candle[0]
+    pipe.zremrangebyscore(key, open_time, open_time)
+    pipe.zadd(key, {encode_candle(candle): open_time})
+    # The set only grows when a bucket opens, so that is the only time it
+    # needs trimming; the TTL outlives the gap until the next one opens.
+    if opened:
+        retention = CANDLE_RETENTION[resolution]
+        pipe.zremrangebyrank(key, 0, -retention - 1)
+        pipe.expire(key, retention * RESOLUTIONS[resolution] // 1000)
+
+
+async def seed_candles(redis_client, builder: CandleBuilder, symbols):
+    """Load the last stored candle of every resolution for symbols the builder hasn't seen yet."""
+    symbols = builder.unseeded(symbols)
+    if not symbols:
+        return
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for symbol in symbols:
+            for resolution in RESOLUTIONS:
+                pipe.zrange(get_candle_key(symbol, resolution), -1, -1)
+        results = iter(await pipe.execute())
+    for symbol in symbols:
+        builder.seed(symbol, {resolution: load_candle(values[0]) if values else None
+                              for resolution, values in zip(RESOLUTIONS, results)})
+
+
+async def get_candles(redis_client, symbol: str, resolution: str, start: int, end: int, limit: int):
+    values = await redis_client.zrevrangebyscore(get_candle_key(symbol, resolution), end, start, start=0, num=limit)
+    return [decode_candle(value) for value in reversed(values)]
+
+
+candle_builder = CandleBuilder()
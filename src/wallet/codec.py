@@ -0,0 +1,68 @@
+import ast
+import asyncio
+import json
+
+# Only the ticker fields we actually read are stored, as a compact JSON array:
+# event time, symbol, close price and base asset volume.
+TICKER_FIELDS = ("E", "s", "c", "v")
+
+
+def encode_ticker(data: dict) -> str:
+    return json.dumps([data.get(field) for field in TICKER_FIELDS], separators=(",", ":"))
+
+
+def decode_ticker(raw: str | bytes) -> dict:
+    if isinstance(raw, bytes):
+        raw = raw.decode()
+    if raw.startswith("{"):
+        # Legacy record written as str(dict) before the codec existed
+        record = ast.literal_eval(raw)
+        return {field: record.get(field) for field in TICKER_FIELDS}
+    return dict(zip(TICKER_FIELDS, json.loads(raw)))
+
+
+async def migrate_legacy_tickers(redis_client, batch_size: int = 1000):
+    """Rewrite every str(dict) ticker key in the compact format, keeping its TTL."""
+    migrated = 0
+    keys = []
+    async for key in redis_client.scan_iter(match="*USDT", count=batch_size):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            migrated += await _migrate_keys(redis_client, keys)
+            keys = []
+    if keys:
+        migrated += await _migrate_keys(redis_client, keys)
+    return migrated
+
+
+async def _migrate_keys(redis_client, keys):
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.type(key)
+            pipe.get(key)
+            pipe.pttl(key)
+        replies = await pipe.execute()
+
+    migrated = 0
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for i, key in enumerate(keys):
+            key_type, value, ttl = replies[3 * i:3 * i + 3]
+            if key_type != "string" or not value or not value.startswith("{"):
+                continue
+            pipe.set(key, encode_ticker(decode_ticker(value)), px=ttl if ttl > 0 else None)
+            migrated += 1
+        await pipe.execute()
+    return migrated
+
+
+async def main():
+    from src.database import init_redis_pool, close_redis_pool
+
+    redis_client = await init_redis_pool()
+    migrated = await migrate_legacy_tickers(redis_client)
+    await close_redis_pool()
+    print(f"Migrated {migrated} ticker keys")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+
+from src.config import WS_QUEUE_SIZE, WS_SLOW_CONSUMER_TIMEOUT, WS_SEND_TIMEOUT
+from src.database import get_redis_client
+from src.metrics import Counter
+from .codec import decode_ticker
+
+dropped_updates = Counter("ws_dropped_updates_total", "Price updates dropped from full websocket queues")
+evicted_clients = Counter("ws_evicted_clients_total", "Websocket clients disconnected for falling behind")
+
+
+def get_channel(symbol: str) -> str:
+    return f"ticker:{symbol}"
+
+
+class SlowConsumer(Exception):
+    pass
+
+
+class OutboundQueue:
+    """Bounded per-connection queue of ticks waiting to be sent.
+
+    When it is full the oldest queued tick for the same symbol is dropped (or
+    the oldest tick overall if that symbol has none queued), so a client that
+    falls behind still ends up with the newest price of every symbol.
+    """
+
+    def __init__(self, maxsize: int = WS_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self._ticks = deque()
+        self._ready = asyncio.Event()
+        self.overflowing_since: float | None = None
+
+    def put_nowait(self, tick: dict):
+        if len(self._ticks) >= self.maxsize:
+            self._drop_oldest(tick["s"])
+            dropped_updates.inc()
+            if self.overflowing_since is None:
+                self.overflowing_since = time.monotonic()
+        self._ticks.append(tick)
+        self._ready.set()
+
+    async def get_batch(self) -> list[dict]:
+        await self._ready.wait()
+        self._ready.clear()
+        batch = list(self._ticks)
+        self._ticks.clear()
+        return batch
+
+    def lagging_for(self) -> float:
+        if self.overflowing_since is None:
+            return 0
+        return time.monotonic() - self.overflowing_since
+
+    def drained(self):
+        # Called after each send. Ticks queued while it was in flight mean the
+        # client hasn't caught up, so the lag clock keeps running.
+        if not self._ticks:
+            self.overflowing_since = None
+
+    def _drop_oldest(self, symbol: str):
+        for i, queued in enumerate(self._ticks):
+            if queued["s"] == symbol:
+                del self._ticks[i]
+                return
+        self._ticks.popleft()
+
+
+async def send_json_bounded(websocket, queue: OutboundQueue, data):
+    """Send to a client unless it has been overflowing its queue for too long."""
+    if queue.lagging_for() > WS_SLOW_CONSUMER_TIMEOUT:
+        raise SlowConsumer()
+    try:
+        await asyncio.wait_for(websocket.send_json(data), WS_SEND_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise SlowConsumer()
+
+
+async def evict_slow_consumer(websocket):
+    evicted_clients.inc()
+    await websocket.close(code=1013, reason="Client is too slow")
+
+
+class PriceHub:
+    """Fans ticks published by the ingestion loop out to local websockets.
+
+    A worker holds a single pub/sub connection and is subscribed only to the
+    symbols that have at least one local viewer, so Redis load follows the
+    number of watched symbols rather than the number of connected clients.
+    Every viewer gets its own `OutboundQueue`; the hub only ever calls
+    `put_nowait`, so a slow client can never stall the fan-out.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[str, set] = defaultdict(set)
+        self._pubsub = None
+        self._reader = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        self._pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+        self._reader = asyncio.create_task(self._read())
+
+    async def stop(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+        self._subscribers.clear()
+
+    async def subscribe(self, symbol: str, queue):
+        async with self._lock:
+            if not self._subscribers[symbol]:
+                await self._pubsub.subscribe(get_channel(symbol))
+            self._subscribers[symbol].add(queue)
+
+    async def unsubscribe(self, symbol: str, queue):
+        async with self._lock:
+            subscribers = self._subscribers.get(symbol)
+            if not subscribers:
+                return
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[symbol]
+                await self._pubsub.unsubscribe(get_channel(symbol))
+
+    async def _read(self):
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None or message["type"] != "message":
+                    continue
+                tick = decode_ticker(message["data"])
+                for queue in list(self._subscribers.get(tick["s"], ())):
+                    queue.put_nowait(tick)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Price hub error: {e}")
+                await asyncio.sleep(1)
+
+
+price_hub = PriceHub()
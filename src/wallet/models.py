@@ -1,7 +1,10 @@
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from src.database import Base
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import ForeignKey, String, Index, UniqueConstraint
 from datetime import datetime
+from decimal import Decimal
+
+from .money import Amount
 
 
 TRANSACTION_OPERATIONS = [
@@ -28,13 +31,17 @@ class Transaction(Base):
     wallet_id: Mapped[int] = mapped_column(ForeignKey("wallet.id", onupdate="NO ACTION", ondelete="CASCADE"), nullable=False)
     currency: Mapped[str] = mapped_column(String(100), nullable=False)
     currency_2: Mapped[str] = mapped_column(String(100), nullable=True)
-    quantity: Mapped[int] = mapped_column(default=0, nullable=False)
-    price: Mapped[int] = mapped_column(nullable=False)
+    quantity: Mapped[Decimal] = mapped_column(Amount, default=0, nullable=False)
+    price: Mapped[Decimal] = mapped_column(Amount, nullable=False)
     type: Mapped[str] = mapped_column(nullable=False)
     executed_at: Mapped[datetime] = mapped_column(default=datetime.now)
 
     wallet = relationship("Wallet", back_populates="transaction")
 
+    __table_args__ = (
+        Index("ix_transaction_wallet_id_executed_at_id", "wallet_id", "executed_at", "id"),
+    )
+
 
 class Currency(Base):
     __tablename__ = "currency"
@@ -42,6 +49,10 @@ class Currency(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     wallet_id: Mapped[int] = mapped_column(ForeignKey("wallet.id", onupdate="NO ACTION", ondelete="CASCADE"), nullable=False)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
-    quantity: Mapped[float] = mapped_column(default=0, nullable=False)
+    quantity: Mapped[Decimal] = mapped_column(Amount, default=0, nullable=False)
 
     wallet = relationship("Wallet", back_populates="currency")
+
+    __table_args__ = (
+        UniqueConstraint("wallet_id", "name", name="uq_currency_wallet_id_name"),
+    )
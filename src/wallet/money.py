@@ -0,0 +1,32 @@
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_EVEN, ROUND_UP
+
+from sqlalchemy import Numeric
+
+# Balances, holdings, quantities and prices are fixed-point decimals with 8
+# digits after the point, the finest step Binance quotes (e.g. SHIB at
+# 0.00001234). Stored as NUMERIC(36, 8) so SQL sums are exact too.
+AMOUNT_PRECISION = 36
+AMOUNT_SCALE = 8
+AMOUNT_STEP = Decimal(1).scaleb(-AMOUNT_SCALE)
+
+Amount = Numeric(AMOUNT_PRECISION, AMOUNT_SCALE)
+
+
+def to_amount(value, rounding: str = ROUND_HALF_EVEN) -> Decimal:
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(AMOUNT_STEP, rounding=rounding)
+
+
+# Rounding always favours the wallet's counterparty: what a user pays is
+# rounded up, what a user receives is rounded down.
+def cost_of(quantity: Decimal, price: Decimal) -> Decimal:
+    return to_amount(quantity * price, ROUND_UP)
+
+
+def proceeds_of(quantity: Decimal, price: Decimal) -> Decimal:
+    return to_amount(quantity * price, ROUND_DOWN)
+
+
+def convert(quantity: Decimal, price_from: Decimal, price_to: Decimal) -> Decimal:
+    return to_amount(quantity * price_from / price_to, ROUND_DOWN)
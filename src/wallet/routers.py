@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.auth.base_config import fastapi_users
 from src.database import get_async_session
 from . import services, schemas
 
 wallet_router = APIRouter()
 
+current_superuser = fastapi_users.current_user(active=True, superuser=True)
+
 
 @wallet_router.get("/get/wallet")
 async def get_wallet(user_id: int, session: AsyncSession = Depends(get_async_session)):
@@ -17,9 +22,24 @@ async def get_all_wallet_data(user_id: int, session: AsyncSession = Depends(get_
     return await services.get__all__wallet__data(user_id=user_id, session=session)
 
 
+@wallet_router.get("/get/wallet/valuation")
+async def get_wallet_valuation(user_id: int, session: AsyncSession = Depends(get_async_session)):
+    return await services.get__wallet__valuation(user_id=user_id, session=session)
+
+
+@wallet_router.get("/get/all/wallets/valuation", dependencies=[Depends(current_superuser)])
+async def get_wallets_valuation(user_ids: list[int] | None = Query(None), limit: int = Query(100, ge=1, le=1000),
+                                after: int | None = None, session: AsyncSession = Depends(get_async_session)):
+    return await services.get__wallets__valuation(user_ids=user_ids, limit=limit, after=after, session=session)
+
+
 @wallet_router.get("/get/all/transactions")
-async def get_all_wallet_data(user_id: int, session: AsyncSession = Depends(get_async_session)):
-    return await services.get__all__transaction(user_id=user_id, session=session)
+async def get_all_wallet_data(user_id: int, limit: int = Query(100, ge=1, le=1000), cursor: str | None = None,
+                              currency: str | None = None, type: str | None = None,
+                              since: datetime | None = None, until: datetime | None = None,
+                              session: AsyncSession = Depends(get_async_session)):
+    return await services.get__all__transaction(user_id=user_id, limit=limit, cursor=cursor, currency=currency,
+                                                transaction_type=type, since=since, until=until, session=session)
 
 
 @wallet_router.put("/set/balance")
@@ -42,6 +62,16 @@ async def swap_currency(user_id: int, transaction: schemas.SwapCoinSchema, sessi
     return await services.swap__currency(user_id=user_id, transaction=transaction, session=session)
 
 
+@wallet_router.post("/batch/orders")
+async def execute_batch(user_id: int, batch: schemas.BatchOrderSchema, session: AsyncSession = Depends(get_async_session)):
+    return await services.execute__batch(user_id=user_id, batch=batch, session=session)
+
+
+@wallet_router.get("/get/symbols")
+async def get_symbols():
+    return services.get__symbols()
+
+
 @wallet_router.post("/create/currency")
 async def create_currency(currency: schemas.CurrencyCreateSchema, session: AsyncSession = Depends(get_async_session)):
     return await services.create__currency(currency=currency, session=session)
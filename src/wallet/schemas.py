@@ -1,5 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from decimal import Decimal
+
+from src.config import BATCH_MAX_ORDERS
 
 
 class WalletCreateSchema(BaseModel):
@@ -15,23 +18,23 @@ class WalletReadSchema(BaseModel):
 class CurrencyCreateSchema(BaseModel):
     wallet_id: int
     name: str
-    quantity: int | float
+    quantity: Decimal
 
 
 class CurrencyReadSchema(BaseModel):
     name: str
-    quantity: int | float
+    quantity: Decimal
 
 
 class CurrencyChangeSchema(BaseModel):
     name: str
-    quantity: int | float
+    quantity: Decimal
 
 
 class BalanceSetSchema(CurrencyCreateSchema):
     wallet_id: int
     name: str = "USDT"
-    quantity: int | float = 100000
+    quantity: Decimal = 100000
 
 
 class BalanceChangeSchema(CurrencyChangeSchema):
@@ -41,7 +44,7 @@ class BalanceChangeSchema(CurrencyChangeSchema):
 class TransactionCreateSchema(BaseModel):
     currency: str
     currency_2: None
-    quantity: int | float
+    quantity: Decimal
     type: str
 
 
@@ -56,3 +59,15 @@ class SaleCoinSchema(TransactionCreateSchema):
 class SwapCoinSchema(TransactionCreateSchema):
     currency_2: str
     type: str = "SWAP"
+
+
+class OrderSchema(BaseModel):
+    currency: str
+    currency_2: str | None = None
+    quantity: Decimal
+    type: str
+
+
+class BatchOrderSchema(BaseModel):
+    orders: list[OrderSchema] = Field(min_length=1, max_length=BATCH_MAX_ORDERS)
+    all_or_nothing: bool = True
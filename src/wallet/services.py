@@ -1,20 +1,57 @@
 import asyncio
+import base64
 import json
+import time
+from datetime import datetime
+from decimal import Decimal, ROUND_DOWN
 
-import aioredis
+import numpy as np
 import websockets
 
-from sqlalchemy import insert, update, select
+from sqlalchemy import insert, update, select, tuple_, literal
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import WebSocket, HTTPException
 from starlette.websockets import WebSocketState
 
-from src.database import async_session_maker
-from src.config import CURRENCY_CACHE_TIME, BINANCE_WEBSOCKET_ALL_COINS_URL, BINANCE_CURRENCY_LIST, BINANCE_USDT_PAIRS_LIST, REDIS_URL
-# from src.main import redis_client
+from src.database import get_redis_client
+from src.config import (CURRENCY_CACHE_TIME, BINANCE_WEBSOCKET_ALL_COINS_URL, PRICE_CACHE_MAX_AGE, TICK_HISTORY_MAX_LEN,
+                        INGEST_FLUSH_SIZE, INGEST_FLUSH_INTERVAL, TRADE_MAX_ATTEMPTS)
 from src.auth.models import User
 from . import schemas
+from .buffer import TickerBuffer
+from .cache import PriceCache
+from .candles import RESOLUTIONS, candle_builder, write_candle, seed_candles, get_candles
+from .codec import encode_ticker, decode_ticker
+from .downsample import lttb
+from .hub import price_hub, get_channel, OutboundQueue, SlowConsumer, send_json_bounded, evict_slow_consumer
 from .models import Wallet, Currency, Transaction, TRANSACTION_OPERATIONS
+from .money import to_amount, cost_of, proceeds_of, convert
+from .symbols import symbol_registry
+from src.metrics import Counter, Gauge, Histogram, LabeledGauge
+
+
+price_cache = PriceCache(max_age=PRICE_CACHE_MAX_AGE)
+# Close price of the tick last written to Redis, per symbol. Cleared whenever
+# a write fails or the feed restarts, so a restarted (empty) Redis gets every
+# price again rather than only the ones that move.
+last_written_prices: dict[str, str] = {}
+suppressed_writes = Counter("ticker_writes_suppressed_total",
+                            "Tickers not written because the symbol is unsupported or the close price is unchanged")
+ingest_pending = Gauge("ingest_pending_symbols", "Symbols with a ticker waiting for the Redis writer")
+ingest_lag = Histogram("ingest_lag_seconds", "Time from Binance event time to the Redis write")
+ingest_frames = Counter("ingest_frames_total", "Frames received from the Binance feed")
+ingest_frame_size = Histogram("ingest_tickers_per_frame", "Tickers in a Binance frame",
+                              buckets=(1, 10, 50, 100, 250, 500, 1000, 2000, 5000))
+ingest_write_time = Histogram("ingest_redis_write_seconds", "Time spent executing a Redis ingestion pipeline")
+ingest_reconnects = Counter("ingest_reconnects_total", "Reconnections to the Binance feed")
+ingest_write_errors = Counter("ingest_write_errors_total", "Ingestion batches that failed to reach Redis")
+# Event time (ms) of the last ticker received per supported symbol
+last_tick_times: dict[str, int] = {}
+ingest_tick_age = LabeledGauge(
+    "ingest_last_tick_age_seconds", "Seconds since the last ticker received for a symbol", "symbol",
+    lambda: {symbol: time.time() - event_time / 1000 for symbol, event_time in last_tick_times.items()})
 
 
 # Checks
@@ -23,7 +60,7 @@ async def check_transaction_type(transaction_type: str):
         raise HTTPException(status_code=400, detail={"message": "Incorrect operation"})
 
 
-async def check_user_exists(user_id: int, session: AsyncSession = async_session_maker()):
+async def check_user_exists(user_id: int, session: AsyncSession):
     try:
         query = select(User).where(User.id == user_id)
         result = await session.execute(query)
@@ -32,11 +69,9 @@ async def check_user_exists(user_id: int, session: AsyncSession = async_session_
             raise HTTPException(status_code=404, detail={"message": f"User not found"})
     except Exception as e:
         print(e)
-    finally:
-        await session.close()
 
 
-async def check_wallet_exists(wallet_id: int, session: AsyncSession = async_session_maker()):
+async def check_wallet_exists(wallet_id: int, session: AsyncSession):
     query = select(Wallet).where(Wallet.id == wallet_id)
     result = await session.execute(query)
     wallet = result.scalar()
@@ -44,45 +79,35 @@ async def check_wallet_exists(wallet_id: int, session: AsyncSession = async_sess
         raise HTTPException(status_code=404, detail={"message": f"Wallet not found"})
 
 
-async def check_quantity(quantity: int):
+async def check_quantity(quantity: Decimal):
     if quantity < 0:
         raise HTTPException(status_code=400, detail={"message": f"Quantity should be positive number"})
 
 
-async def check_balance(balance: float, price: float, quantity: int):
-    if balance < quantity * price:
-        raise HTTPException(status_code=400, detail={"message": f"Your balance is less than transaction price"})
-
-
-async def check_currency_exist(currency):
-    if not currency or currency.quantity <= 0:
-        raise HTTPException(status_code=400, detail={"message": f"You have no {currency.name} coin"})
-
-
-async def check_c_quantity_not_negative(currency, sell_c_quantity):
-    if currency.quantity - sell_c_quantity < 0:
-        raise HTTPException(status_code=400, detail={"message": "You can't sell more coins than you have"})
-
-
 async def check_price_exists(price):
     if not price:
         raise HTTPException(status_code=400, detail={"message": "Price not found"})
 
 
 async def check_currency_in_list(currency):
-    if currency not in BINANCE_CURRENCY_LIST and currency != "USDT":
+    if not symbol_registry.is_supported_currency(currency):
         raise HTTPException(status_code=400, detail=
                 {"message": "Currency not found. Unfortunately we don't support other currencies"})
 
 
 async def check_pair_in_list(currency):
-    if currency not in BINANCE_USDT_PAIRS_LIST and currency != "USDT":
+    if not symbol_registry.is_supported_pair(currency):
         raise HTTPException(status_code=400, detail=
                 {"message": "Currency not found. Unfortunately we don't support other currencies"})
 
 
+# Symbols
+def get__symbols():
+    return {"symbols": [vars(info) for info in symbol_registry.pairs()]}
+
+
 # Wallet services
-async def get__wallet(user_id: int, session: AsyncSession = async_session_maker()):
+async def get__wallet(user_id: int, session: AsyncSession):
     try:
         query = select(Wallet).where(Wallet.user_id == user_id)
         result = await session.execute(query)
@@ -90,11 +115,9 @@ async def get__wallet(user_id: int, session: AsyncSession = async_session_maker(
         return wallet
     except Exception as e:
         print(e)
-    finally:
-        await session.close()
 
 
-async def get__all__wallet__data(user_id: int, session: AsyncSession = async_session_maker()):
+async def get__all__wallet__data(user_id: int, session: AsyncSession):
     try:
         wallet = await get__wallet(user_id=user_id, session=session)
         query = select(Currency).where(Currency.wallet_id == wallet.id)
@@ -104,42 +127,137 @@ async def get__all__wallet__data(user_id: int, session: AsyncSession = async_ses
         return {"wallet": wallet, "currencies": currencies}
     except Exception as e:
         print(e)
-    finally:
-        await session.close()
 
 
-async def create__wallet(wallet_data: schemas.WalletCreateSchema, session: AsyncSession = async_session_maker()):
+def value__holdings(wallet_ids: list[int], names: list[str], quantities: list[Decimal], prices: dict[str, Decimal]):
+    """Value every (wallet, asset) row in USDT.
+
+    Holdings are NUMERIC(36, 8), more digits than float64 keeps and, once
+    multiplied by a price, more than int64 base units hold, so the sums are
+    done in Decimal. Returns the per-row prices and values (None where no
+    price is known) and the per-wallet totals in order of first appearance.
+    """
+    row_prices = [Decimal(1) if name == "USDT" else prices.get(name) for name in names]
+    row_values = [None if price is None else to_amount(quantity * price)
+                  for quantity, price in zip(quantities, row_prices)]
+
+    totals = {}
+    for wallet_id, value in zip(wallet_ids, row_values):
+        totals[wallet_id] = totals.get(wallet_id, to_amount(0)) + (value or 0)
+    return row_prices, row_values, totals
+
+
+def format_amount(value: Decimal | None) -> str | None:
+    # Strings, since the JSON encoder would turn Decimals back into floats
+    return None if value is None else format(value, "f")
+
+
+async def value__wallets(rows):
+    if not rows:
+        return {}
+    wallet_ids = [row.wallet_id for row in rows]
+    names = [row.name for row in rows]
+    quantities = [row.quantity for row in rows]
+
+    prices = await get_current_prices({name for name in names if name != "USDT"})
+    row_prices, row_values, totals = value__holdings(wallet_ids, names, quantities, prices)
+
+    valuations = {
+        wallet_id: {"wallet_id": wallet_id, "total": format_amount(total), "currencies": []}
+        for wallet_id, total in totals.items()
+    }
+    for wallet_id, name, quantity, price, value in zip(wallet_ids, names, quantities, row_prices, row_values):
+        valuations[wallet_id]["currencies"].append({
+            "name": name,
+            "quantity": format_amount(quantity),
+            "price": format_amount(price),
+            "value": format_amount(value),
+        })
+    return valuations
+
+
+async def get__wallet__valuation(user_id: int, session: AsyncSession):
     try:
-        stmt = insert(Wallet).values(**wallet_data.model_dump())
-        wallet = await session.execute(stmt)
-        await session.commit()
+        query = (select(Currency.wallet_id, Currency.name, Currency.quantity)
+                 .join(Wallet, Wallet.id == Currency.wallet_id)
+                 .where(Wallet.user_id == user_id))
+        rows = (await session.execute(query)).all()
+        valuations = await value__wallets(rows)
+        if not valuations:
+            raise HTTPException(status_code=404, detail={"message": f"Wallet not found"})
+        return next(iter(valuations.values()))
+    except HTTPException as e:
+        return e
+    except Exception as e:
+        print(e)
+
 
-        wallet_id = wallet.inserted_primary_key[0]
-        balance_data = wallet_data.model_dump()
-        balance_data["wallet_id"] = wallet_id
+async def get__wallets__valuation(user_ids: list[int] | None, session: AsyncSession, limit: int = 100,
+                                  after: int | None = None):
+    """One page of wallet valuations, ordered by wallet id.
 
-        await create__currency(currency=schemas.BalanceSetSchema(**balance_data))
+    Pass the returned `next_cursor` as `after` to get the following page.
+    It is None on the last page.
+    """
+    try:
+        query = select(Wallet.id).order_by(Wallet.id).limit(limit + 1)
+        if user_ids:
+            query = query.where(Wallet.user_id.in_(user_ids))
+        if after is not None:
+            query = query.where(Wallet.id > after)
+        wallet_ids = (await session.execute(query)).scalars().all()
+        next_cursor = wallet_ids[limit - 1] if len(wallet_ids) > limit else None
+
+        query = (select(Currency.wallet_id, Currency.name, Currency.quantity)
+                 .where(Currency.wallet_id.in_(wallet_ids[:limit]))
+                 .order_by(Currency.wallet_id, Currency.name))
+        rows = (await session.execute(query)).all()
+        valuations = await value__wallets(rows)
+        return {"wallets": list(valuations.values()), "next_cursor": next_cursor}
     except Exception as e:
         print(e)
-    finally:
-        await session.close()
+
+
+def create__wallet__statement(user_id):
+    """A wallet and its opening USDT balance as one INSERT ... RETURNING chain.
+
+    `user_id` is either an id or the id column of a preceding INSERT CTE, so
+    registration can create the user, the wallet and the balance in a single
+    statement. Returns one (user_id, wallet_id) row.
+    """
+    if isinstance(user_id, int):
+        user_id = literal(user_id)
+    balance = schemas.BalanceSetSchema(wallet_id=0)
+    new_wallet = (
+        insert(Wallet)
+        .from_select(["user_id", "created_at"], select(user_id, literal(datetime.now())))
+        .returning(Wallet.id, Wallet.user_id)
+        .cte("new_wallet")
+    )
+    new_balance = (
+        insert(Currency)
+        .from_select(["wallet_id", "name", "quantity"],
+                     select(new_wallet.c.id, literal(balance.name), literal(to_amount(balance.quantity))))
+        .returning(Currency.id)
+        .cte("new_balance")
+    )
+    return select(new_wallet.c.user_id, new_wallet.c.id).add_cte(new_balance)
 
 
 # Currency/Coin services
-async def create__currency(currency: schemas.CurrencyCreateSchema, session: AsyncSession = async_session_maker()):
+async def create__currency(currency: schemas.CurrencyCreateSchema, session: AsyncSession):
     try:
         await check_wallet_exists(wallet_id=currency.wallet_id, session=session)
         await check_currency_in_list(currency=currency.name)
-        stmt = insert(Currency).values(**currency.model_dump())
-        await session.execute(stmt)
+        # Adds to the holding if the wallet already has this currency
+        await credit__currency(wallet_id=currency.wallet_id, name=currency.name,
+                               quantity=to_amount(currency.quantity), session=session)
         await session.commit()
     except Exception as e:
         print(e)
-    finally:
-        await session.close()
 
 
-async def get__currency(wallet_id: int, currency: str, session: AsyncSession = async_session_maker()):
+async def get__currency(wallet_id: int, currency: str, session: AsyncSession):
     try:
         await check_currency_in_list(currency=currency)
         query = select(Currency).where((Currency.name == currency) & (Currency.wallet_id == wallet_id))
@@ -148,13 +266,11 @@ async def get__currency(wallet_id: int, currency: str, session: AsyncSession = a
         return currency
     except Exception as e:
         print(e)
-    finally:
-        await session.close()
 
 
-async def set__currency(user_id: int, currency: schemas.CurrencyChangeSchema, session: AsyncSession = async_session_maker()):
+async def set__currency(user_id: int, currency: schemas.CurrencyChangeSchema, session: AsyncSession):
     try:
-        await check_user_exists(user_id=user_id)
+        await check_user_exists(user_id=user_id, session=session)
         await check_currency_in_list(currency=currency.name)
         wallet = await get__wallet(user_id=user_id, session=session)
         stmt = update(Currency).values(**currency.model_dump()).where(
@@ -164,286 +280,579 @@ async def set__currency(user_id: int, currency: schemas.CurrencyChangeSchema, se
         await session.commit()
     except Exception as e:
         print(e)
-    finally:
-        await session.close()
 
 
-async def set__balance(user_id: int, balance: schemas.BalanceChangeSchema, session: AsyncSession = async_session_maker()):
+async def set__balance(user_id: int, balance: schemas.BalanceChangeSchema, session: AsyncSession):
     try:
-        await check_user_exists(user_id=user_id)
+        await check_user_exists(user_id=user_id, session=session)
         await set__currency(user_id=user_id, currency=balance, session=session)
         return {"message": "Balance successfully set/changed."}
     except HTTPException as e:
         return e
     except Exception as e:
         print(e)
-    finally:
-        await session.close()
-
-
-async def get__balance(user_id: int, session: AsyncSession = async_session_maker()):
-    try:
-        wallet = await get__wallet(user_id=user_id, session=session)
-        balance = await session.execute(
-            select(Currency.quantity).where((Currency.wallet_id == wallet.id) & (Currency.name == "USDT")))
-        balance_value = balance.scalar()
-        return balance_value
-    except Exception as e:
-        print(e)
-    finally:
-        await session.close()
 
 
 # Redis
-async def get_current_price(currency: str):
+async def get_current_prices(currencies) -> dict[str, Decimal]:
+    prices = {}
+    missing = []
+    for currency in currencies:
+        price = price_cache.get(currency + "USDT")
+        if price:
+            prices[currency] = price
+        else:
+            missing.append(currency)
+
+    if missing:
+        redis_client = get_redis_client()
+        values = await redis_client.mget([currency + "USDT" for currency in missing])
+        for currency, value in zip(missing, values):
+            if not value:
+                continue
+            ticker = decode_ticker(value)
+            # The key outlives the feed, so an old tick is no price at all
+            if not price_cache.is_fresh(ticker["E"]):
+                continue
+            price = Decimal(ticker["c"])
+            price_cache.set(currency + "USDT", price, ticker["E"])
+            prices[currency] = price
+    return prices
+
+
+async def get__candles(symbol: str, resolution: str, start: int | None = None, end: int | None = None,
+                       limit: int = 500):
     try:
-        redis_client = await aioredis.from_url(REDIS_URL, decode_responses=True)
-        async with redis_client:
-            key = currency + "USDT"
-            currency_data = await redis_client.get(key)
-            currency_data = currency_data.replace("'", "\"")
-            data_dict = json.loads(currency_data)
-            price = data_dict["c"]
-            if price:
-                return float(price)
-            return {"message": "Error happened. (Probably coin doesn't exist)"}
+        symbol = symbol.upper()
+        await check_pair_in_list(symbol)
+        if resolution not in RESOLUTIONS:
+            raise HTTPException(status_code=400, detail=
+                {"message": f"Resolution should be one of {', '.join(RESOLUTIONS)}"})
+        end = end if end is not None else int(time.time() * 1000)
+        start = start if start is not None else 0
+        candles = await get_candles(get_redis_client(), symbol=symbol, resolution=resolution, start=start, end=end,
+                                    limit=limit)
+        return {"symbol": symbol, "resolution": resolution, "candles": candles}
+    except HTTPException as e:
+        return e
     except Exception as e:
         print(e)
 
 
 # Transaction services
-async def get__all__transaction(user_id: int, session: AsyncSession = async_session_maker()):
-    try:
-        wallet = await get__wallet(user_id=user_id, session=session)
-        query = select(Transaction).where(Transaction.wallet_id == wallet.id)
-        result = await session.execute(query)
-        transactions = [row._asdict() for row in result.fetchall()]
+def encode_transaction_cursor(transaction: Transaction) -> str:
+    position = json.dumps([transaction.executed_at.isoformat(), transaction.id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
 
-        return {"transactions": transactions}
-    except Exception as e:
-        print(e)
-    finally:
-        await session.close()
 
+def as_executed_at(value: datetime) -> datetime:
+    """`value` as the naive local time `Transaction.executed_at` is stored in.
+
+    The column is a naive timestamp filled by `datetime.now`, and asyncpg
+    refuses to compare it with a timezone-aware parameter.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
 
-async def create_transaction(wallet_id: int, transaction: dict, session: AsyncSession = async_session_maker()):
+
+def decode_transaction_cursor(cursor: str):
     try:
-        stmt = insert(Transaction).values(wallet_id=wallet_id, **transaction)
-        await session.execute(stmt)
-        await session.commit()
-    except Exception as e:
-        print(e)
-    finally:
-        await session.close()
+        executed_at, transaction_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return as_executed_at(datetime.fromisoformat(executed_at)), int(transaction_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail={"message": "Invalid cursor"})
 
 
-async def buy__currency(user_id: int, transaction: schemas.PurchaseCoinSchema, session: AsyncSession = async_session_maker()):
+async def get__all__transaction(user_id: int, session: AsyncSession, limit: int = 100, cursor: str | None = None,
+                                currency: str | None = None, transaction_type: str | None = None,
+                                since: datetime | None = None, until: datetime | None = None):
+    """Newest-first page of a wallet's transactions.
+
+    Pages are keyset-paginated on (executed_at, id), served by the
+    (wallet_id, executed_at, id) index; pass the returned `next_cursor` back
+    to get the following page. It is None on the last page.
+    """
     try:
-        await check_user_exists(user_id=user_id)
-        transaction_dict = transaction.model_dump()
-        t_currency = transaction_dict.get("currency", None).upper()
-        c_quantity = transaction_dict.get("quantity", None)
-        await check_quantity(quantity=c_quantity)
-
-        price = await get_current_price(t_currency)
-        await check_price_exists(price)
-
-        transaction_dict["currency"] = t_currency
-        transaction_dict["price"] = price
-        balance = await get__balance(user_id=user_id, session=session)
-        await check_balance(balance=balance, price=price, quantity=c_quantity)
-
-        balance = balance - c_quantity * price
-        currency_dict = {"name": t_currency, "quantity": c_quantity}
-        wallet = await get__wallet(user_id=user_id, session=session)
-        currency = await get__currency(wallet_id=wallet.id, currency=t_currency, session=session)
+        query = select(Transaction).where(Transaction.wallet_id == wallet_id_of(user_id))
         if currency:
-            currency_dict["quantity"] = currency.quantity + c_quantity
-            await set__currency(user_id=user_id, currency=schemas.CurrencyChangeSchema(**currency_dict))
-        else:
-            currency_dict["wallet_id"] = wallet.id
-            await create__currency(currency=schemas.CurrencyCreateSchema(**currency_dict))
+            currency = currency.upper()
+            query = query.where((Transaction.currency == currency) | (Transaction.currency_2 == currency))
+        if transaction_type:
+            await check_transaction_type(transaction_type)
+            query = query.where(Transaction.type == transaction_type)
+        since = as_executed_at(since) if since else None
+        until = as_executed_at(until) if until else None
+        if since and until and since >= until:
+            raise HTTPException(status_code=400, detail={"message": "since should be earlier than until"})
+        if since:
+            query = query.where(Transaction.executed_at >= since)
+        if until:
+            query = query.where(Transaction.executed_at < until)
+        if cursor:
+            executed_at, transaction_id = decode_transaction_cursor(cursor)
+            query = query.where(tuple_(Transaction.executed_at, Transaction.id) < tuple_(executed_at, transaction_id))
+        query = query.order_by(Transaction.executed_at.desc(), Transaction.id.desc()).limit(limit + 1)
 
-        await create_transaction(wallet_id=wallet.id, transaction=transaction_dict, session=session)
-        balance_dict = {"quantity": balance}
-        await set__balance(user_id=user_id, balance=schemas.BalanceChangeSchema(**balance_dict), session=session)
-        return {
-            "message": f"{c_quantity} {t_currency} successfully purchased",
-            "price(all)": f"{c_quantity * price}",
-            "price": f"{price}"
-        }
+        result = await session.execute(query)
+        rows = result.fetchall()
+        next_cursor = encode_transaction_cursor(rows[limit - 1].Transaction) if len(rows) > limit else None
+        transactions = [row._asdict() for row in rows[:limit]]
+
+        return {"transactions": transactions, "next_cursor": next_cursor}
     except HTTPException as e:
         return e
     except Exception as e:
         print(e)
-    finally:
-        await session.close()
 
 
-async def sell__currency(user_id: int, transaction: schemas.SaleCoinSchema, session: AsyncSession = async_session_maker()):
-    try:
-        await check_user_exists(user_id=user_id)
-        transaction_dict = transaction.model_dump()
-        t_currency = transaction_dict.get("currency", None).upper()
-        c_quantity = transaction_dict.get("quantity", None)
-        await check_quantity(quantity=c_quantity)
+# Trade engine
+# Every trade runs as a single DB transaction. Debits are conditional
+# UPDATE ... RETURNING statements and credits are INSERT ... ON CONFLICT
+# upserts, so two concurrent trades can never both spend the same funds or
+# create duplicate holdings, and the journal row is written in the same commit.
+# Both holdings a trade touches are locked up front in name order, so a buy
+# and a sell on the same wallet can't lock them in opposite orders and
+# deadlock; if Postgres still aborts a trade as a deadlock or serialization
+# failure it is retried.
+RETRYABLE_SQLSTATES = {"40P01", "40001"}
 
-        price = await get_current_price(t_currency)
-        await check_price_exists(price)
 
-        transaction_dict["currency"] = t_currency
-        transaction_dict["price"] = price
-        balance = await get__balance(user_id=user_id, session=session)
+def wallet_id_of(user_id: int):
+    return select(Wallet.id).where(Wallet.user_id == user_id).scalar_subquery()
 
-        balance = balance + c_quantity * price
-        currency_dict = {"name": t_currency, "quantity": c_quantity}
-        wallet = await get__wallet(user_id=user_id, session=session)
-        currency = await get__currency(wallet_id=wallet.id, currency=t_currency, session=session)
 
-        await check_currency_exist(currency=currency)
-        await check_c_quantity_not_negative(currency=currency, sell_c_quantity=c_quantity)
+async def lock__currencies(wallet_id, names, session: AsyncSession):
+    stmt = (
+        select(Currency.id)
+        .where((Currency.wallet_id == wallet_id) & Currency.name.in_(sorted(set(names))))
+        .order_by(Currency.name)
+        .with_for_update()
+    )
+    await session.execute(stmt)
 
-        currency_dict["quantity"] = currency.quantity - c_quantity
-        await set__currency(user_id=user_id, currency=schemas.CurrencyChangeSchema(**currency_dict))
 
-        await create_transaction(wallet_id=wallet.id, transaction=transaction_dict, session=session)
-        balance_dict = {"name": "USDT", "quantity": balance}
-        await set__balance(user_id=user_id, balance=schemas.BalanceChangeSchema(**balance_dict))
+async def run__trade(session: AsyncSession, apply):
+    """Run `apply()` in its own transaction, retrying deadlocks and serialization failures."""
+    for attempt in range(1, TRADE_MAX_ATTEMPTS + 1):
+        try:
+            async with session.begin():
+                return await apply()
+        except DBAPIError as e:
+            if getattr(e.orig, "sqlstate", None) not in RETRYABLE_SQLSTATES:
+                raise
+            print(f"Trade conflict, attempt {attempt}/{TRADE_MAX_ATTEMPTS}: {e.orig}")
+    raise HTTPException(status_code=409, detail={"message": "Trade conflicted with another trade, try again"})
+
+
+async def debit__currency(wallet_id, name: str, quantity: Decimal, session: AsyncSession):
+    stmt = (
+        update(Currency)
+        .where((Currency.wallet_id == wallet_id) & (Currency.name == name) & (Currency.quantity >= quantity))
+        .values(quantity=Currency.quantity - quantity)
+        .returning(Currency.wallet_id, Currency.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    return result.first()
+
+
+async def credit__currency(wallet_id: int, name: str, quantity: Decimal, session: AsyncSession):
+    # Single-statement upsert-increment on the (wallet_id, name) unique index
+    stmt = pg_insert(Currency).values(wallet_id=wallet_id, name=name, quantity=quantity)
+    stmt = (
+        stmt.on_conflict_do_update(
+            index_elements=[Currency.wallet_id, Currency.name],
+            set_={"quantity": Currency.quantity + stmt.excluded.quantity},
+        )
+        .returning(Currency.quantity)
+    )
+    result = await session.execute(stmt)
+    return result.scalar()
+
+
+async def raise_debit_error(wallet_id, name: str, session: AsyncSession):
+    wallet = (await session.execute(select(Wallet.id).where(Wallet.id == wallet_id))).scalar()
+    if not wallet:
+        raise HTTPException(status_code=404, detail={"message": f"Wallet not found"})
+    if name == "USDT":
+        raise HTTPException(status_code=400, detail={"message": f"Your balance is less than transaction price"})
+    quantity = (await session.execute(
+        select(Currency.quantity).where((Currency.wallet_id == wallet_id) & (Currency.name == name)))).scalar()
+    if not quantity or quantity <= 0:
+        raise HTTPException(status_code=400, detail={"message": f"You have no {name} coin"})
+    raise HTTPException(status_code=400, detail={"message": "You can't sell more coins than you have"})
+
+
+async def apply__purchase(wallet_id, currency: str, quantity: Decimal, price: Decimal, session: AsyncSession):
+    await lock__currencies(wallet_id=wallet_id, names=("USDT", currency), session=session)
+    debited = await debit__currency(wallet_id=wallet_id, name="USDT", quantity=cost_of(quantity, price),
+                                    session=session)
+    if not debited:
+        await raise_debit_error(wallet_id=wallet_id, name="USDT", session=session)
+    wallet_id, balance = debited
+    await credit__currency(wallet_id=wallet_id, name=currency, quantity=quantity, session=session)
+    await session.execute(insert(Transaction).values(
+        wallet_id=wallet_id, currency=currency, quantity=quantity, price=price, type="PURCHASE"))
+    return balance
+
+
+async def apply__sale(wallet_id, currency: str, quantity: Decimal, price: Decimal, session: AsyncSession):
+    await lock__currencies(wallet_id=wallet_id, names=(currency, "USDT"), session=session)
+    debited = await debit__currency(wallet_id=wallet_id, name=currency, quantity=quantity, session=session)
+    if not debited:
+        await raise_debit_error(wallet_id=wallet_id, name=currency, session=session)
+    wallet_id, _ = debited
+    balance = await credit__currency(wallet_id=wallet_id, name="USDT", quantity=proceeds_of(quantity, price),
+                                     session=session)
+    await session.execute(insert(Transaction).values(
+        wallet_id=wallet_id, currency=currency, quantity=quantity, price=price, type="SALE"))
+    return balance
+
+
+async def apply__swap(wallet_id, currency: str, currency_2: str, quantity: Decimal, quantity_2: Decimal,
+                      session: AsyncSession):
+    await lock__currencies(wallet_id=wallet_id, names=(currency, currency_2), session=session)
+    debited = await debit__currency(wallet_id=wallet_id, name=currency, quantity=quantity, session=session)
+    if not debited:
+        await raise_debit_error(wallet_id=wallet_id, name=currency, session=session)
+    wallet_id, _ = debited
+    new_quantity_2 = await credit__currency(wallet_id=wallet_id, name=currency_2, quantity=quantity_2, session=session)
+    await session.execute(insert(Transaction).values(
+        wallet_id=wallet_id, currency=currency, currency_2=currency_2, quantity=quantity, price=quantity_2,
+        type="SWAP"))
+    return new_quantity_2
+
+
+async def apply__order(wallet_id: int, order: schemas.OrderSchema, prices: dict, session: AsyncSession):
+    await check_transaction_type(order.type)
+    t_currency = order.currency.upper()
+    c_quantity = to_amount(order.quantity, ROUND_DOWN)
+    await check_quantity(quantity=c_quantity)
+    await check_currency_in_list(currency=t_currency)
+    price = prices.get(t_currency)
+    await check_price_exists(price)
+
+    if order.type == "PURCHASE":
+        await apply__purchase(wallet_id=wallet_id, currency=t_currency, quantity=c_quantity, price=price,
+                              session=session)
+        return {
+            "message": f"{c_quantity} {t_currency} successfully purchased",
+            "price(all)": f"{cost_of(c_quantity, price)}",
+            "price": f"{price}"
+        }
+
+    if order.type == "SALE":
+        await apply__sale(wallet_id=wallet_id, currency=t_currency, quantity=c_quantity, price=price,
+                          session=session)
         return {
             "message": f"{c_quantity} {t_currency} successfully sold",
-            "price(all)": f"{c_quantity * price}",
+            "price(all)": f"{proceeds_of(c_quantity, price)}",
             "price": f"{price}"
         }
-    except HTTPException as e:
-        return e
+
+    t_currency_2 = (order.currency_2 or "").upper()
+    await check_currency_in_list(currency=t_currency_2)
+    price_2 = prices.get(t_currency_2)
+    await check_price_exists(price_2)
+    c_quantity_2 = convert(c_quantity, price, price_2)
+    await apply__swap(wallet_id=wallet_id, currency=t_currency, currency_2=t_currency_2, quantity=c_quantity,
+                      quantity_2=c_quantity_2, session=session)
+    return {
+        "message": f"{c_quantity} {t_currency} successfully swapped to {c_quantity_2} {t_currency_2}",
+        "price(all)": f"{c_quantity_2}",
+        "price": f"{price / price_2}"
+    }
+
+
+def order__currencies(order: schemas.OrderSchema) -> set[str]:
+    currencies = {order.currency.upper()}
+    if order.currency_2:
+        currencies.add(order.currency_2.upper())
+    return currencies
+
+
+async def execute__order(user_id: int, order: schemas.OrderSchema, session: AsyncSession):
+    try:
+        prices = await get_current_prices(order__currencies(order))
+        return await run__trade(session, lambda: apply__order(
+            wallet_id=wallet_id_of(user_id), order=order, prices=prices, session=session))
+    except HTTPException:
+        raise
     except Exception as e:
         print(e)
-    finally:
-        await session.close()
+        raise HTTPException(status_code=500, detail={"message": "Trade failed"})
+
+
+async def buy__currency(user_id: int, transaction: schemas.PurchaseCoinSchema, session: AsyncSession):
+    order = schemas.OrderSchema(currency=transaction.currency, quantity=transaction.quantity, type="PURCHASE")
+    return await execute__order(user_id=user_id, order=order, session=session)
+
 
+async def sell__currency(user_id: int, transaction: schemas.SaleCoinSchema, session: AsyncSession):
+    order = schemas.OrderSchema(currency=transaction.currency, quantity=transaction.quantity, type="SALE")
+    return await execute__order(user_id=user_id, order=order, session=session)
 
-async def swap__currency(user_id: int, transaction: schemas.SwapCoinSchema, session: AsyncSession = async_session_maker()):
+
+async def swap__currency(user_id: int, transaction: schemas.SwapCoinSchema, session: AsyncSession):
+    order = schemas.OrderSchema(currency=transaction.currency, currency_2=transaction.currency_2,
+                                quantity=transaction.quantity, type="SWAP")
+    return await execute__order(user_id=user_id, order=order, session=session)
+
+
+async def execute__batch(user_id: int, batch: schemas.BatchOrderSchema, session: AsyncSession):
+    """Apply many orders for one wallet with one price fetch and one transaction.
+
+    With `all_or_nothing` the first failing order rolls back the whole batch;
+    otherwise each order runs in its own savepoint and failures are reported
+    per order while the rest are committed.
+    """
     try:
-        await check_user_exists(user_id=user_id)
-        transaction_dict = transaction.model_dump()
-        t_currency = transaction_dict.get("currency", None).upper()
-        t_currency_2 = transaction_dict.get("currency_2", None).upper()
-        c_quantity = transaction_dict.get("quantity", None)
-        await check_quantity(quantity=c_quantity)
-
-        price_1 = await get_current_price(t_currency)
-        price_2 = await get_current_price(t_currency_2)
-        await check_price_exists(price_1)
-        await check_price_exists(price_2)
-
-        c_quantity_2 = round(c_quantity * price_1 / price_2, 2)
-
-        transaction_dict["currency"] = t_currency
-        transaction_dict["currency_2"] = t_currency_2
-        transaction_dict["price"] = c_quantity_2
-        currency_dict_1 = {"name": t_currency, "quantity": c_quantity}
-        currency_dict_2 = {"name": t_currency_2, "quantity": c_quantity_2}
+        currencies = set()
+        for order in batch.orders:
+            currencies |= order__currencies(order)
+        prices = await get_current_prices(currencies)
+
+        async def apply():
+            wallet_id = (await session.execute(select(Wallet.id).where(Wallet.user_id == user_id))).scalar()
+            if not wallet_id:
+                raise HTTPException(status_code=404, detail={"message": f"Wallet not found"})
+            # Every holding the batch touches is locked once, in name order
+            await lock__currencies(wallet_id=wallet_id, names=currencies | {"USDT"}, session=session)
+
+            results = []
+            for index, order in enumerate(batch.orders):
+                try:
+                    if batch.all_or_nothing:
+                        result = await apply__order(wallet_id=wallet_id, order=order, prices=prices, session=session)
+                    else:
+                        async with session.begin_nested():
+                            result = await apply__order(wallet_id=wallet_id, order=order, prices=prices,
+                                                        session=session)
+                    results.append({"index": index, "status": "executed", **result})
+                except HTTPException as e:
+                    if batch.all_or_nothing:
+                        raise HTTPException(status_code=e.status_code, detail={"index": index, **e.detail})
+                    results.append({"index": index, "status": "failed", **e.detail})
+            return results
+
+        return {"results": await run__trade(session, apply)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail={"message": "Trade failed"})
 
-        wallet = await get__wallet(user_id=user_id, session=session)
-        w_currency_1 = await get__currency(wallet_id=wallet.id, currency=t_currency)
-        w_currency_2 = await get__currency(wallet_id=wallet.id, currency=t_currency_2)
 
-        await check_currency_exist(currency=w_currency_1)
-        await check_c_quantity_not_negative(currency=w_currency_1, sell_c_quantity=c_quantity)
+# Redis
+def get_history_key(symbol: str) -> str:
+    return f"ticks:{symbol}"
+
 
-        currency_dict_1["quantity"] = w_currency_1.quantity - c_quantity
+async def get_last_ticks(symbol: str, count: int):
+    redis_client = get_redis_client()
+    values = await redis_client.zrange(get_history_key(symbol), -count, -1)
+    return [decode_ticker(value) for value in values]
 
-        if w_currency_2:
-            currency_dict_2["quantity"] = w_currency_2.quantity + c_quantity_2
-            await set__currency(user_id=user_id, currency=schemas.CurrencyChangeSchema(**currency_dict_2))
-        else:
-            currency_dict_2["quantity"] = c_quantity_2
-            currency_dict_2["wallet_id"] = wallet.id
-            await create__currency(currency=schemas.CurrencyCreateSchema(**currency_dict_2))
-        await set__currency(user_id=user_id, currency=schemas.CurrencyChangeSchema(**currency_dict_1))
-        await create_transaction(wallet_id=wallet.id, transaction=transaction_dict, session=session)
+
+async def get_ticks_between(symbol: str, start: int, end: int):
+    redis_client = get_redis_client()
+    values = await redis_client.zrangebyscore(get_history_key(symbol), start, end)
+    return [decode_ticker(value) for value in values]
+
+
+async def get__price__history(symbol: str, start: int | None = None, end: int | None = None, points: int = 500):
+    """Close prices of a symbol between `start` and `end` (ms), at most `points` of them.
+
+    Longer ranges are downsampled with LTTB so the chart keeps its shape
+    while the response size stays bounded.
+    """
+    try:
+        symbol = symbol.upper()
+        await check_pair_in_list(symbol)
+        end = end if end is not None else int(time.time() * 1000)
+        start = start if start is not None else 0
+        ticks = await get_ticks_between(symbol, start, end)
+        if ticks:
+            times = np.array([tick["E"] for tick in ticks], dtype=np.float64)
+            prices = np.array([tick["c"] for tick in ticks], dtype=np.float64)
+            ticks = [ticks[i] for i in lttb(times, prices, points)]
         return {
-            "message": f"{c_quantity} {t_currency} successfully swapped to {c_quantity_2} {t_currency_2}",
-            "price(all)": f"{c_quantity * price_1 / price_2}",
-            "price": f"{price_1 / price_2}"
+            "symbol": symbol,
+            "start": start,
+            "end": end,
+            "prices": [{"time": tick["E"], "price": tick["c"]} for tick in ticks],
         }
     except HTTPException as e:
         return e
     except Exception as e:
         print(e)
-    finally:
-        await session.close()
 
 
-# Redis
 async def save_coin_data_to_redis(json_list):
     try:
-        redis_client = await aioredis.from_url(REDIS_URL)
-        async with redis_client:
+        redis_client = get_redis_client()
+        cache_time_ms = int(CURRENCY_CACHE_TIME) * 1000
+        # The whole frame goes out as one pipelined batch: each symbol's tick
+        # is added to its history sorted set (scored by event time and trimmed
+        # by age and length), and the latest prices are folded into a single
+        # MSET, so a frame costs one round-trip. Each tick is also published
+        # once on its symbol channel for the websocket hubs. Tickers whose
+        # close price matches the last one written are skipped entirely.
+        # Every supported ticker is folded into the 1m/5m/1h/1d candles, and
+        # the candles it changed are overwritten in the same pipeline; symbols
+        # new to this process first pick up their stored open candles.
+        # Returns the tickers whose price was written.
+        await seed_candles(redis_client, candle_builder,
+                           {json_data["s"] for json_data in json_list
+                            if symbol_registry.is_supported_pair(json_data["s"])})
+        latest_prices = {}
+        close_prices = {}
+        written_prices = {}
+        written_tickers = []
+        async with redis_client.pipeline(transaction=False) as pipe:
             for json_data in json_list:
-                if "USDT" not in json_data["s"]:
+                symbol = json_data["s"]
+                if not symbol_registry.is_supported_pair(symbol):
+                    suppressed_writes.inc()
+                    continue
+                close_prices[symbol] = (Decimal(json_data["c"]), json_data["E"])
+                last_tick_times[symbol] = json_data["E"]
+                for resolution, candle, opened in candle_builder.update(json_data):
+                    write_candle(pipe, symbol, resolution, candle, opened)
+                if last_written_prices.get(symbol) == json_data["c"]:
+                    suppressed_writes.inc()
                     continue
                 event_time = json_data["E"]
-                symbol = json_data["s"]
-                history_key = f"{str(event_time)}_{symbol}"
+                history_key = get_history_key(symbol)
                 price_key = f"{str(symbol)}"
-                await redis_client.set(history_key, str(json_data), ex=CURRENCY_CACHE_TIME)
-                await redis_client.set(price_key, str(json_data))
-    except Exception as e:
-        print(e)
+                ticker = encode_ticker(json_data)
+                pipe.zadd(history_key, {ticker: event_time})
+                pipe.zremrangebyscore(history_key, "-inf", event_time - cache_time_ms)
+                pipe.zremrangebyrank(history_key, 0, -TICK_HISTORY_MAX_LEN - 1)
+                pipe.expire(history_key, CURRENCY_CACHE_TIME)
+                pipe.publish(get_channel(symbol), ticker)
+                latest_prices[price_key] = ticker
+                written_prices[symbol] = json_data["c"]
+                written_tickers.append(json_data)
+            if latest_prices:
+                pipe.mset(latest_prices)
+            if len(pipe):
+                started_at = time.perf_counter()
+                await pipe.execute()
+                ingest_write_time.observe(time.perf_counter() - started_at)
+        last_written_prices.update(written_prices)
+        # Unchanged prices still refresh the in-process cache so trades keep
+        # reading them without going to Redis.
+        price_cache.update(close_prices)
+        return written_tickers
+    except Exception:
+        # Re-raised so the supervisor in get_currency_data restarts the pipeline
+        ingest_write_errors.inc()
+        last_written_prices.clear()
+        raise
+
+
+async def send_currency_ticks(currency: str, websocket: WebSocket, queue: OutboundQueue):
+    last_time = 0
+    ticks = await get_last_ticks(currency, TICK_HISTORY_MAX_LEN)
+    while True:
+        for value_dict in ticks:
+            time = value_dict["E"]
+            if time <= last_time:
+                continue
+            symbol = value_dict["s"]
+            price = value_dict["c"]
+            data = {"time": time, "symbol": symbol, "price": price}
+            await send_json_bounded(websocket, queue, str(data))
+            last_time = time
+        queue.drained()
+        ticks = await queue.get_batch()
+
+
+async def wait_for_disconnect(websocket: WebSocket):
+    # The client sends nothing on this socket, so anything else is ignored
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
 
 
 async def get_currency_data_from_redis(currency: str, websocket: WebSocket):
+    queue = OutboundQueue()
+    sender = receiver = None
     try:
         await check_pair_in_list(currency)
-        redis_client = await aioredis.from_url(REDIS_URL)
-        async with redis_client:
-            keys = await redis_client.keys(f"*_{currency}")
-            # keys = await redis_client.scan_iter(f"*_{currency}", count=100)
-            for key in keys:
-                value = await redis_client.get(key)
-                if isinstance(value, bytes):
-                    value_dict = json.loads(str(value, 'utf-8').replace("'", "\""))
-                    time = value_dict["E"]
-                    symbol = value_dict["s"]
-                    price = value_dict["c"]
-                    data = {"time": time, "symbol": symbol, "price": price}
-                    await websocket.send_json(str(data))
-
-            while websocket.client_state != WebSocketState.DISCONNECTED:
-                keys = await redis_client.keys(f"*_{currency}")
-                # keys = await redis_client.scan_iter(f"*_{currency}", count=100)
-                for key in keys:
-                    value = await redis_client.get(key)
-                    if isinstance(value, bytes):
-                        value_dict = json.loads(str(value, 'utf-8').replace("'", "\""))
-                        time = value_dict["E"]
-                        symbol = value_dict["s"]
-                        price = value_dict["c"]
-                        data = {"time": time, "symbol": symbol, "price": price}
-                        await websocket.send_json(str(data))
-                        await asyncio.sleep(1)
+        # Subscribe before reading the history so no tick falls in between;
+        # anything already sent as history is skipped by its event time.
+        await price_hub.subscribe(currency, queue)
+        # Race the sender against the socket so a disconnect is noticed right
+        # away instead of on the next tick, which may never come.
+        sender = asyncio.create_task(send_currency_ticks(currency, websocket, queue))
+        receiver = asyncio.create_task(wait_for_disconnect(websocket))
+        done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except SlowConsumer:
+        await evict_slow_consumer(websocket)
     except Exception as e:
         print(f"Unexpected error: {e}")
     finally:
-        await websocket.close()
+        for task in (sender, receiver):
+            if task is not None:
+                task.cancel()
+        await price_hub.unsubscribe(currency, queue)
+        if WebSocketState.DISCONNECTED not in (websocket.client_state, websocket.application_state):
+            await websocket.close()
 
 
 # BinanceAPI services
+# The receiver only reads the socket and merges each frame into the ticker
+# buffer, so a slow Redis never stalls the feed and no symbol's latest price
+# is ever dropped. The writer flushes the buffer once enough symbols are
+# pending or INGEST_FLUSH_INTERVAL has passed since the first of them arrived.
+# The two run as sibling tasks; if either fails, both are restarted.
+async def write_coin_data(buffer: TickerBuffer):
+    while True:
+        tickers = await buffer.take(size=INGEST_FLUSH_SIZE, interval=INGEST_FLUSH_INTERVAL)
+        ingest_pending.set(len(buffer))
+
+        written = await save_coin_data_to_redis(tickers)
+        written_at = time.time()
+        for json_data in written:
+            ingest_lag.observe(written_at - json_data["E"] / 1000)
+
+
+async def receive_coin_data(url: str, buffer: TickerBuffer):
+    async with websockets.connect(uri=url, ping_interval=None, ping_timeout=None) as ws:
+        while True:
+            json_list = json.loads(await ws.recv())
+            ingest_frames.inc()
+            ingest_frame_size.observe(len(json_list))
+            buffer.merge(json_list)
+            ingest_pending.set(len(buffer))
+
+
 async def get_currency_data():
     url = BINANCE_WEBSOCKET_ALL_COINS_URL
+    buffer = TickerBuffer()
     while True:
+        last_written_prices.clear()
+        receiver = asyncio.create_task(receive_coin_data(url, buffer))
+        writer = asyncio.create_task(write_coin_data(buffer))
         try:
-            async with websockets.connect(uri=url, ping_interval=None, ping_timeout=None) as ws:
-                while True:
-                    data = await ws.recv()
-                    json_list = json.loads(data)
-                    await save_coin_data_to_redis(json_list)
-                    await asyncio.sleep(1)
-        except websockets.ConnectionClosed as e:
-            print(f"Websocket connection closed: {e}")
-            await asyncio.sleep(1)
-            print("Reconnecting...")
-        except Exception as e:
-            print(f"Error while getting coin data: {e}")
-            break
+            done, _ = await asyncio.wait({receiver, writer}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            receiver.cancel()
+            writer.cancel()
+            await asyncio.gather(receiver, writer, return_exceptions=True)
+
+        for task in done:
+            e = task.exception()
+            if isinstance(e, websockets.ConnectionClosed):
+                print(f"Websocket connection closed: {e}")
+            elif task is writer:
+                print(f"Redis writer stopped: {e!r}")
+            else:
+                print(f"Error while getting coin data: {e!r}")
+        await asyncio.sleep(1)
+        ingest_reconnects.inc()
+        print("Reconnecting...")
@@ -0,0 +1,111 @@
+import asyncio
+import math
+
+from fastapi import WebSocket, HTTPException
+from starlette.websockets import WebSocketDisconnect
+
+from src.config import WS_MAX_UPDATE_RATE
+from .hub import price_hub, OutboundQueue, SlowConsumer, send_json_bounded, evict_slow_consumer
+from .services import check_pair_in_list, get_last_ticks
+
+
+class PriceStream:
+    """A websocket client watching any number of symbols over one connection.
+
+    The hub hands ticks to a bounded `OutboundQueue`. The sender wakes at most
+    `rate` times a second, keeps only the newest queued tick per symbol and
+    pushes the symbols whose price changed since the last push, so
+    intermediate ticks are merged into the latest one. Clients that keep
+    overflowing the queue are disconnected.
+
+    Client messages:
+        {"action": "subscribe", "symbols": ["BTCUSDT", "ETHUSDT"]}
+        {"action": "unsubscribe", "symbols": ["ETHUSDT"]}
+    """
+
+    def __init__(self, websocket: WebSocket, rate: float):
+        self.websocket = websocket
+        if not math.isfinite(rate):
+            rate = WS_MAX_UPDATE_RATE
+        self.interval = 1 / min(max(rate, 0.1), WS_MAX_UPDATE_RATE)
+        self.symbols: set[str] = set()
+        self.queue = OutboundQueue()
+        self.sent_prices: dict[str, str] = {}
+
+    async def run(self):
+        receiver = asyncio.create_task(self._receive_commands())
+        sender = asyncio.create_task(self._send_updates())
+        try:
+            done, _ = await asyncio.wait({receiver, sender}, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            receiver.cancel()
+            sender.cancel()
+            await asyncio.gather(receiver, sender, return_exceptions=True)
+            for symbol in list(self.symbols):
+                await price_hub.unsubscribe(symbol, self.queue)
+            self.symbols.clear()
+
+    async def subscribe(self, symbols: list[str]):
+        for symbol in symbols:
+            if symbol in self.symbols:
+                continue
+            try:
+                await check_pair_in_list(symbol)
+            except HTTPException as e:
+                await self.websocket.send_json({"symbol": symbol, "error": e.detail})
+                continue
+            await price_hub.subscribe(symbol, self.queue)
+            self.symbols.add(symbol)
+            for tick in await get_last_ticks(symbol, 1):
+                self.queue.put_nowait(tick)
+        await self.websocket.send_json({"subscribed": sorted(self.symbols)})
+
+    async def unsubscribe(self, symbols: list[str]):
+        for symbol in symbols:
+            if symbol not in self.symbols:
+                continue
+            await price_hub.unsubscribe(symbol, self.queue)
+            self.symbols.discard(symbol)
+            self.sent_prices.pop(symbol, None)
+        await self.websocket.send_json({"subscribed": sorted(self.symbols)})
+
+    async def _receive_commands(self):
+        while True:
+            message = await self.websocket.receive_json()
+            action = message.get("action")
+            symbols = [str(symbol).upper() for symbol in message.get("symbols", [])]
+            if action == "subscribe":
+                await self.subscribe(symbols)
+            elif action == "unsubscribe":
+                await self.unsubscribe(symbols)
+            else:
+                await self.websocket.send_json({"error": {"message": "Unknown action"}})
+
+    async def _send_updates(self):
+        while True:
+            latest = {tick["s"]: tick for tick in await self.queue.get_batch()}
+            prices = []
+            for symbol, tick in latest.items():
+                if symbol not in self.symbols or self.sent_prices.get(symbol) == tick["c"]:
+                    continue
+                self.sent_prices[symbol] = tick["c"]
+                prices.append({"time": tick["E"], "symbol": symbol, "price": tick["c"]})
+            if prices:
+                await send_json_bounded(self.websocket, self.queue, {"prices": prices})
+            self.queue.drained()
+            await asyncio.sleep(self.interval)
+
+
+async def stream_currency_data(websocket: WebSocket, rate: float = WS_MAX_UPDATE_RATE):
+    stream = PriceStream(websocket=websocket, rate=rate)
+    try:
+        await stream.run()
+    except WebSocketDisconnect:
+        pass
+    except SlowConsumer:
+        await evict_slow_consumer(websocket)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        await websocket.close()
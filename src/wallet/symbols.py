@@ -0,0 +1,89 @@
+import asyncio
+import json
+import os
+from dataclasses import dataclass
+
+from src.config import SYMBOLS_FILE, SYMBOLS_RELOAD_INTERVAL
+
+QUOTE_ASSET = "USDT"
+
+
+@dataclass(frozen=True)
+class SymbolInfo:
+    symbol: str
+    base: str
+    quote: str
+    status: str
+    base_precision: int
+    quote_precision: int
+
+
+class SymbolRegistry:
+    """Tradable USDT pairs loaded from a Binance exchangeInfo-style JSON file.
+
+    Lookups by pair ("BTCUSDT") and by base asset ("BTC") are dict hits. The
+    file is re-read by `watch` whenever its mtime changes, and the indexes
+    are swapped in one assignment so readers never see a half-built table.
+    """
+
+    def __init__(self, path: str, quote: str = QUOTE_ASSET):
+        self.path = path
+        self.quote = quote
+        self._pairs: dict[str, SymbolInfo] = {}
+        self._bases: dict[str, SymbolInfo] = {}
+        self._mtime: float | None = None
+
+    def load(self):
+        mtime = os.path.getmtime(self.path)
+        with open(self.path) as file:
+            exchange_info = json.load(file)
+
+        pairs = {}
+        for entry in exchange_info["symbols"]:
+            if entry.get("quoteAsset") != self.quote or entry.get("status") != "TRADING":
+                continue
+            info = SymbolInfo(
+                symbol=entry["symbol"],
+                base=entry["baseAsset"],
+                quote=entry["quoteAsset"],
+                status=entry["status"],
+                base_precision=entry.get("baseAssetPrecision", 8),
+                quote_precision=entry.get("quotePrecision", 8),
+            )
+            pairs[info.symbol] = info
+        self._pairs, self._bases = pairs, {info.base: info for info in pairs.values()}
+        self._mtime = mtime
+
+    def reload_if_changed(self) -> bool:
+        if os.path.getmtime(self.path) == self._mtime:
+            return False
+        self.load()
+        return True
+
+    async def watch(self, interval: float = SYMBOLS_RELOAD_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self.reload_if_changed():
+                    print(f"Symbol registry reloaded: {len(self._pairs)} pairs")
+            except Exception as e:
+                print(f"Symbol registry reload failed: {e}")
+
+    def get_pair(self, symbol: str) -> SymbolInfo | None:
+        return self._pairs.get(symbol)
+
+    def get_base(self, base: str) -> SymbolInfo | None:
+        return self._bases.get(base)
+
+    def is_supported_pair(self, symbol: str) -> bool:
+        return symbol in self._pairs
+
+    def is_supported_currency(self, currency: str) -> bool:
+        return currency == self.quote or currency in self._bases
+
+    def pairs(self) -> list[SymbolInfo]:
+        return list(self._pairs.values())
+
+
+symbol_registry = SymbolRegistry(SYMBOLS_FILE)
+symbol_registry.load()
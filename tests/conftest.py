@@ -0,0 +1,102 @@
+import os
+
+# src.config reads these at import time; the tests never reach a real
+# Postgres, Redis or mail server.
+for name, value in {
+    "SECRET": "test-secret",
+    "DB_HOST": "localhost", "DB_PORT": "5432", "DB_NAME": "test", "DB_USER": "test", "DB_PASS": "test",
+    "RS_HOST": "localhost", "RS_PORT": "6379",
+    "MAIL_HOST": "localhost", "MAIL_PORT": "25", "MAIL_EMAIL": "test@example.com", "MAIL_PASSWORD": "test",
+    "CURRENCY_CACHE_TIME": "3600",
+}.items():
+    os.environ.setdefault(name, value)
+
+from decimal import Decimal
+
+import fakeredis.aioredis
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src import database
+from src.database import Base
+from src.auth.hasher import password_hasher
+from src.auth.models import Role, User, OAuthAccount
+from src.auth.services import UserManager
+from src.auth.utilts import CachedUserDatabase
+from src.wallet.models import Wallet, Currency
+
+
+@pytest.fixture
+async def redis_client(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(database, "redis_client", client)
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+async def session():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.fixture
+async def postgres_session_factory():
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_async_engine(url)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(Role).values(id=1, name="user"))
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.fixture
+async def wallet(session):
+    """A user's wallet holding 1000 USDT."""
+    user = User(email="dave@example.com", firstname="Dave", lastname="Doe", role_id=1, hashed_password="x")
+    session.add(user)
+    await session.flush()
+    wallet = Wallet(user_id=user.id)
+    session.add(wallet)
+    await session.flush()
+    session.add(Currency(wallet_id=wallet.id, name="USDT", quantity=Decimal(1000)))
+    await session.commit()
+    # Detached, so a rolled back trade doesn't expire it
+    session.expunge(wallet)
+    return wallet
+
+
+@pytest.fixture
+async def user(session):
+    user = User(email="alice@example.com", firstname="Alice", lastname="Doe", role_id=1,
+                hashed_password=password_hasher.context.hash("old-password"))
+    session.add(user)
+    await session.commit()
+    return user
+
+
+@pytest.fixture
+def user_manager(session, user):
+    return UserManager(CachedUserDatabase(session, User, OAuthAccount), password_helper=password_hasher)
+
+
+@pytest.fixture
+def reset_tokens(user_manager, monkeypatch):
+    """Password reset tokens the manager would have mailed."""
+    tokens = []
+
+    async def on_after_forgot_password(user, token, request=None):
+        tokens.append(token)
+
+    monkeypatch.setattr(user_manager, "on_after_forgot_password", on_after_forgot_password)
+    return tokens
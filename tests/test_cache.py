@@ -0,0 +1,42 @@
+import time
+from decimal import Decimal
+
+from src.wallet import services
+from src.wallet.cache import PriceCache
+from src.wallet.codec import encode_ticker
+
+
+def now_ms(offset: float = 0) -> int:
+    return int((time.time() + offset) * 1000)
+
+
+def test_price_is_served_until_it_is_older_than_max_age(monkeypatch):
+    cache = PriceCache(max_age=5)
+    cache.set("BTCUSDT", Decimal("100"), event_time=1_000_000)
+
+    monkeypatch.setattr(time, "time", lambda: 1_004.9)
+    assert cache.get("BTCUSDT") == Decimal("100")
+    monkeypatch.setattr(time, "time", lambda: 1_005.1)
+    assert cache.get("BTCUSDT") is None
+
+
+def test_age_is_taken_from_the_event_time_not_the_write():
+    cache = PriceCache(max_age=5)
+    cache.update({"BTCUSDT": (Decimal("100"), now_ms(-6)), "ETHUSDT": (Decimal("10"), now_ms(-1))})
+
+    assert cache.get("BTCUSDT") is None
+    assert cache.get("ETHUSDT") == Decimal("10")
+    assert cache.get("XRPUSDT") is None
+
+
+async def test_stale_redis_price_is_neither_used_nor_cached(redis_client, monkeypatch):
+    cache = PriceCache(max_age=5)
+    monkeypatch.setattr(services, "price_cache", cache)
+    await redis_client.mset({
+        "BTCUSDT": encode_ticker({"s": "BTCUSDT", "E": now_ms(-60), "c": "100", "v": "1"}),
+        "ETHUSDT": encode_ticker({"s": "ETHUSDT", "E": now_ms(-1), "c": "10", "v": "1"}),
+    })
+
+    assert await services.get_current_prices({"BTC", "ETH"}) == {"ETH": Decimal("10")}
+    assert cache.get("ETHUSDT") == Decimal("10")
+    assert cache.get("BTCUSDT") is None
@@ -0,0 +1,102 @@
+from decimal import Decimal
+
+from src.wallet import services
+from src.wallet.candles import CandleBuilder, decode_candle, encode_candle, get_candle_key, load_candle, write_candle
+
+MINUTE = 60_000
+HOUR = 60 * MINUTE
+
+
+def ticker(event_time, price, volume="100"):
+    return {"s": "BTCUSDT", "E": event_time, "c": price, "v": volume}
+
+
+def candles(changes):
+    return {resolution: decode_candle(encode_candle(candle)) for resolution, candle, _ in changes}
+
+
+def test_ticks_in_one_bucket_update_high_low_close_and_volume():
+    builder = CandleBuilder()
+    builder.update(ticker(HOUR + 1, "100", "10"))
+    builder.update(ticker(HOUR + 2, "105", "12"))
+    changed = candles(builder.update(ticker(HOUR + 3, "98", "15")))
+
+    assert changed["1m"] == {"t": HOUR, "o": "100", "h": "105", "l": "98", "c": "98", "v": "5"}
+    assert changed["1h"] == changed["1m"]
+
+
+def test_new_bucket_opens_a_new_candle_only_for_that_resolution():
+    builder = CandleBuilder()
+    builder.update(ticker(HOUR + 1, "100"))
+    changed = candles(builder.update(ticker(HOUR + MINUTE + 1, "110")))
+
+    assert changed["1m"] == {"t": HOUR + MINUTE, "o": "110", "h": "110", "l": "110", "c": "110", "v": "0"}
+    assert changed["5m"] == {"t": HOUR, "o": "100", "h": "110", "l": "100", "c": "110", "v": "0"}
+
+
+def test_unchanged_tick_and_late_tick_change_nothing():
+    builder = CandleBuilder()
+    builder.update(ticker(HOUR + MINUTE + 1, "100"))
+    assert builder.update(ticker(HOUR + MINUTE + 2, "100")) == []
+    # A tick from the previous minute only lands in the still-open 5m/1h/1d candles
+    assert [resolution for resolution, _, _ in builder.update(ticker(HOUR + 1, "90"))] == ["5m", "1h", "1d"]
+
+
+def test_only_a_new_bucket_is_flagged_as_opened():
+    builder = CandleBuilder()
+    assert {resolution: opened for resolution, _, opened in builder.update(ticker(HOUR + 1, "100"))} == {
+        "1m": True, "5m": True, "1h": True, "1d": True}
+    assert {resolution: opened for resolution, _, opened in builder.update(ticker(HOUR + MINUTE, "101"))} == {
+        "1m": True, "5m": False, "1h": False, "1d": False}
+
+
+class RecordingPipeline:
+    def __init__(self):
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append(name)
+
+
+def test_candle_set_is_trimmed_only_when_a_bucket_opens():
+    candle = [HOUR, Decimal(1), Decimal(1), Decimal(1), Decimal(1), Decimal(0)]
+    updated, opened = RecordingPipeline(), RecordingPipeline()
+    write_candle(updated, "BTCUSDT", "1m", candle, opened=False)
+    write_candle(opened, "BTCUSDT", "1m", candle, opened=True)
+
+    assert updated.commands == ["zremrangebyscore", "zadd"]
+    assert opened.commands == ["zremrangebyscore", "zadd", "zremrangebyrank", "expire"]
+
+
+def test_seeded_candle_is_merged_with_new_ticks():
+    builder = CandleBuilder()
+    stored = load_candle(encode_candle([HOUR, Decimal("100"), Decimal("120"), Decimal("90"), Decimal("110"),
+                                        Decimal("7")]))
+    builder.seed("BTCUSDT", {"1m": None, "5m": None, "1h": stored, "1d": None})
+    changed = candles(builder.update(ticker(HOUR + 30 * MINUTE, "95")))
+
+    assert changed["1h"] == {"t": HOUR, "o": "100", "h": "120", "l": "90", "c": "95", "v": "7"}
+    assert builder.unseeded(["BTCUSDT", "ETHUSDT"]) == ["ETHUSDT"]
+
+
+def test_seeded_candle_from_a_closed_bucket_is_replaced():
+    builder = CandleBuilder()
+    builder.seed("BTCUSDT", {"1h": [0, Decimal(1), Decimal(2), Decimal(1), Decimal(2), Decimal(3)]})
+    changed = candles(builder.update(ticker(HOUR + 1, "100")))
+    assert changed["1h"]["t"] == HOUR
+    assert changed["1h"]["o"] == "100"
+
+
+async def test_restart_keeps_the_stored_candle(redis_client, monkeypatch):
+    monkeypatch.setattr(services, "candle_builder", CandleBuilder())
+    monkeypatch.setattr(services, "last_written_prices", {})
+    await services.save_coin_data_to_redis([ticker(HOUR + 1, "100", "10")])
+    await services.save_coin_data_to_redis([ticker(HOUR + 2, "130", "20")])
+
+    # A new process starts with an empty builder
+    monkeypatch.setattr(services, "candle_builder", CandleBuilder())
+    await services.save_coin_data_to_redis([ticker(HOUR + 10 * MINUTE, "120", "25")])
+
+    stored = await redis_client.zrange(get_candle_key("BTCUSDT", "1h"), 0, -1)
+    assert [decode_candle(value) for value in stored] == [
+        {"t": HOUR, "o": "100", "h": "130", "l": "100", "c": "120", "v": "10"}]
@@ -0,0 +1,16 @@
+from src.wallet.codec import decode_ticker, encode_ticker
+
+TICKER = {"e": "24hrTicker", "E": 1700000000000, "s": "BTCUSDT", "c": "37000.01000000", "v": "12345.6", "q": "1"}
+
+
+def test_only_the_read_fields_are_stored():
+    assert encode_ticker(TICKER) == '[1700000000000,"BTCUSDT","37000.01000000","12345.6"]'
+
+
+def test_round_trip():
+    assert decode_ticker(encode_ticker(TICKER)) == {"E": 1700000000000, "s": "BTCUSDT", "c": "37000.01000000",
+                                                    "v": "12345.6"}
+
+
+def test_legacy_str_dict_records_and_bytes_are_decoded():
+    assert decode_ticker(str(TICKER).encode()) == decode_ticker(encode_ticker(TICKER))
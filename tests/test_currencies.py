@@ -0,0 +1,68 @@
+import importlib.util
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select, text
+
+from src.auth.models import User
+from src.wallet import schemas
+from src.wallet.models import Wallet, Currency
+from src.wallet.services import create__currency, credit__currency
+
+MIGRATION = Path(__file__).parent.parent / "migration" / "versions" / "d71a0c3e95b8_unique_wallet_currency.py"
+
+
+async def currency_rows(session, wallet_id):
+    result = await session.execute(select(Currency.name, Currency.quantity)
+                                   .where(Currency.wallet_id == wallet_id).order_by(Currency.name))
+    return result.all()
+
+
+async def test_crediting_twice_keeps_one_row_with_the_sum(session, wallet):
+    await credit__currency(wallet_id=wallet.id, name="BTC", quantity=Decimal("0.25"), session=session)
+    assert await credit__currency(wallet_id=wallet.id, name="BTC", quantity=Decimal("0.5"),
+                                  session=session) == Decimal("0.75")
+    await session.commit()
+
+    assert await currency_rows(session, wallet.id) == [("BTC", Decimal("0.75")), ("USDT", Decimal(1000))]
+
+
+async def test_creating_an_existing_currency_adds_to_it(session, wallet):
+    for quantity in ("1", "2"):
+        await create__currency(schemas.CurrencyCreateSchema(wallet_id=wallet.id, name="ETH", quantity=quantity),
+                               session=session)
+
+    assert await currency_rows(session, wallet.id) == [("ETH", Decimal(3)), ("USDT", Decimal(1000))]
+
+
+@pytest.mark.postgres
+async def test_migration_merges_duplicate_holdings(postgres_session_factory):
+    pytest.importorskip("alembic")
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    spec = importlib.util.spec_from_file_location("unique_wallet_currency", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    def upgrade(connection):
+        with Operations.context(MigrationContext.configure(connection)):
+            migration.upgrade()
+
+    async with postgres_session_factory() as session:
+        user = User(email="frank@example.com", firstname="Frank", lastname="Doe", role_id=1, hashed_password="x")
+        session.add(user)
+        await session.flush()
+        wallet = Wallet(user_id=user.id)
+        session.add(wallet)
+        await session.flush()
+        connection = await session.connection()
+        await connection.execute(text("ALTER TABLE currency DROP CONSTRAINT uq_currency_wallet_id_name"))
+        await connection.execute(text("INSERT INTO currency (wallet_id, name, quantity) VALUES "
+                                      "(:id, 'BTC', 1), (:id, 'BTC', 2), (:id, 'USDT', 5), (:id, 'BTC', 3)"),
+                                 {"id": wallet.id})
+        await connection.run_sync(upgrade)
+        await session.commit()
+
+        assert await currency_rows(session, wallet.id) == [("BTC", Decimal(6)), ("USDT", Decimal(5))]
@@ -0,0 +1,28 @@
+import numpy as np
+
+from src.wallet.downsample import lttb
+
+
+def test_short_series_is_returned_whole():
+    x = np.arange(5, dtype=float)
+    assert list(lttb(x, x, 10)) == [0, 1, 2, 3, 4]
+    assert list(lttb(x, x, 2)) == [0, 1, 2, 3, 4]
+
+
+def test_keeps_endpoints_and_returns_increasing_indices():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 300)
+    selected = lttb(x, y, 100)
+
+    assert len(selected) == 100
+    assert selected[0] == 0 and selected[-1] == 9_999
+    assert np.all(np.diff(selected) > 0)
+
+
+def test_keeps_spikes():
+    x = np.arange(1_000, dtype=float)
+    y = np.zeros(1_000)
+    y[321], y[777] = 50, -50
+    selected = lttb(x, y, 20)
+
+    assert 321 in selected and 777 in selected
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from src.auth.hasher import PasswordHasher, password_hasher
+from src.auth.schemas import UserUpdate
+
+
+@pytest.fixture
+def bcrypt_threads(monkeypatch):
+    """Names of the threads every bcrypt hash/verify ran on."""
+    threads = []
+
+    def recorded(method):
+        def wrapper(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return method(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(password_hasher, "hash", recorded(password_hasher.hash))
+    monkeypatch.setattr(password_hasher, "verify_and_update", recorded(password_hasher.verify_and_update))
+    return threads
+
+
+async def test_password_reset_hashes_off_the_event_loop(user, user_manager, reset_tokens, redis_client,
+                                                        bcrypt_threads):
+    await user_manager.forgot_password(user)
+    await user_manager.reset_password(reset_tokens[0], "new-password")
+
+    assert len(bcrypt_threads) == 3
+    assert all(name.startswith("bcrypt") for name in bcrypt_threads)
+
+
+async def test_password_update_hashes_off_the_event_loop(user, user_manager, redis_client, bcrypt_threads):
+    user = await user_manager.update(UserUpdate(password="another-password"), user)
+
+    assert password_hasher.context.verify("another-password", user.hashed_password)
+    assert bcrypt_threads and all(name.startswith("bcrypt") for name in bcrypt_threads)
+
+
+async def test_jobs_beyond_the_workers_and_the_queue_are_refused():
+    hasher = PasswordHasher(CryptContext(schemes=["bcrypt"]), max_workers=1, max_queue=1)
+    release = threading.Event()
+    hasher.hash = lambda password: release.wait(5)
+    try:
+        # One job running and one waiting fill the hasher
+        jobs = [asyncio.create_task(hasher.hash_async("password")) for _ in range(2)]
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(HTTPException) as error:
+            await hasher.hash_async("password")
+        assert error.value.status_code == 503
+    finally:
+        release.set()
+    assert await asyncio.gather(*jobs) == [True, True]
+    hasher.shutdown()
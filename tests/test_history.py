@@ -0,0 +1,41 @@
+from src.wallet import services
+
+SECOND = 1_000
+
+
+def ticker(event_time, price):
+    return {"s": "BTCUSDT", "E": event_time, "c": price, "v": "1"}
+
+
+async def write_ticks(monkeypatch, count):
+    monkeypatch.setattr(services, "last_written_prices", {})
+    for i in range(count):
+        await services.save_coin_data_to_redis([ticker(i * SECOND, str(100 + i))])
+
+
+async def test_last_ticks_are_the_newest_in_time_order(redis_client, monkeypatch):
+    await write_ticks(monkeypatch, 5)
+
+    ticks = await services.get_last_ticks("BTCUSDT", 2)
+
+    assert [(tick["E"], tick["c"]) for tick in ticks] == [(3 * SECOND, "103"), (4 * SECOND, "104")]
+    assert await services.get_last_ticks("ETHUSDT", 2) == []
+
+
+async def test_range_bounds_are_inclusive(redis_client, monkeypatch):
+    await write_ticks(monkeypatch, 5)
+
+    ticks = await services.get_ticks_between("BTCUSDT", 1 * SECOND, 3 * SECOND)
+
+    assert [tick["E"] for tick in ticks] == [1 * SECOND, 2 * SECOND, 3 * SECOND]
+
+
+async def test_history_is_downsampled_to_the_requested_points(redis_client, monkeypatch):
+    await write_ticks(monkeypatch, 20)
+
+    history = await services.get__price__history("btcusdt", start=0, end=19 * SECOND, points=5)
+
+    assert history["symbol"] == "BTCUSDT"
+    assert len(history["prices"]) == 5
+    assert history["prices"][0] == {"time": 0, "price": "100"}
+    assert history["prices"][-1] == {"time": 19 * SECOND, "price": "119"}
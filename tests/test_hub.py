@@ -0,0 +1,107 @@
+import asyncio
+
+from starlette.websockets import WebSocketState
+
+from src.wallet import services
+from src.wallet.hub import OutboundQueue
+
+
+def tick(symbol, event_time):
+    return {"s": symbol, "E": event_time}
+
+
+async def test_batches_are_returned_in_order():
+    queue = OutboundQueue(maxsize=10)
+    queue.put_nowait(tick("BTCUSDT", 1))
+    queue.put_nowait(tick("ETHUSDT", 2))
+    assert await queue.get_batch() == [tick("BTCUSDT", 1), tick("ETHUSDT", 2)]
+
+
+async def test_full_queue_drops_the_oldest_tick_of_the_same_symbol():
+    queue = OutboundQueue(maxsize=3)
+    queue.put_nowait(tick("BTCUSDT", 1))
+    queue.put_nowait(tick("ETHUSDT", 1))
+    queue.put_nowait(tick("BTCUSDT", 2))
+    queue.put_nowait(tick("BTCUSDT", 3))
+
+    assert await queue.get_batch() == [tick("ETHUSDT", 1), tick("BTCUSDT", 2), tick("BTCUSDT", 3)]
+
+
+async def test_full_queue_drops_the_oldest_tick_when_the_symbol_is_new():
+    queue = OutboundQueue(maxsize=2)
+    queue.put_nowait(tick("BTCUSDT", 1))
+    queue.put_nowait(tick("ETHUSDT", 1))
+    queue.put_nowait(tick("XRPUSDT", 1))
+
+    assert await queue.get_batch() == [tick("ETHUSDT", 1), tick("XRPUSDT", 1)]
+
+
+async def test_lag_is_tracked_until_drained():
+    queue = OutboundQueue(maxsize=1)
+    assert queue.lagging_for() == 0
+    queue.put_nowait(tick("BTCUSDT", 1))
+    queue.put_nowait(tick("BTCUSDT", 2))
+    await asyncio.sleep(0.01)
+    assert queue.lagging_for() > 0
+
+    # Still behind while ticks are waiting
+    queue.drained()
+    assert queue.lagging_for() > 0
+
+    await queue.get_batch()
+    queue.drained()
+    assert queue.lagging_for() == 0
+
+
+async def test_get_batch_waits_for_a_tick():
+    queue = OutboundQueue()
+    batch = asyncio.create_task(queue.get_batch())
+    await asyncio.sleep(0)
+    assert not batch.done()
+
+    queue.put_nowait(tick("BTCUSDT", 1))
+    assert await asyncio.wait_for(batch, timeout=1) == [tick("BTCUSDT", 1)]
+
+
+class DisconnectingWebSocket:
+    """Client that goes away right after connecting and never gets a tick."""
+
+    def __init__(self):
+        self.client_state = self.application_state = WebSocketState.CONNECTED
+        self.sent = []
+
+    async def receive(self):
+        self.client_state = WebSocketState.DISCONNECTED
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=None):
+        raise AssertionError("closed a socket the client already disconnected")
+
+
+async def test_single_symbol_stream_unsubscribes_as_soon_as_the_client_leaves(monkeypatch):
+    subscribed = set()
+
+    async def check_pair_in_list(currency):
+        pass
+
+    async def get_last_ticks(currency, count):
+        return [{"s": currency, "E": 1, "c": "100"}]
+
+    async def subscribe(symbol, queue):
+        subscribed.add(symbol)
+
+    async def unsubscribe(symbol, queue):
+        subscribed.discard(symbol)
+
+    monkeypatch.setattr(services, "check_pair_in_list", check_pair_in_list)
+    monkeypatch.setattr(services, "get_last_ticks", get_last_ticks)
+    monkeypatch.setattr(services.price_hub, "subscribe", subscribe)
+    monkeypatch.setattr(services.price_hub, "unsubscribe", unsubscribe)
+    websocket = DisconnectingWebSocket()
+
+    await asyncio.wait_for(services.get_currency_data_from_redis("BTCUSDT", websocket), 1)
+
+    assert not subscribed
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from src.metrics import Histogram
+from src.wallet import services
+from src.wallet.buffer import TickerBuffer
+
+
+def ticker(symbol, event_time, price):
+    return {"s": symbol, "E": event_time, "c": price, "v": "1"}
+
+
+async def test_buffer_keeps_the_newest_ticker_per_symbol():
+    buffer = TickerBuffer()
+    buffer.merge([ticker("BTCUSDT", 2, "101"), ticker("ETHUSDT", 1, "10")])
+    buffer.merge([ticker("BTCUSDT", 1, "100")])
+    buffer.merge([ticker("BTCUSDT", 3, "102")])
+
+    tickers = await buffer.take(size=2, interval=1)
+
+    assert {t["s"]: t["c"] for t in tickers} == {"BTCUSDT": "102", "ETHUSDT": "10"}
+    assert len(buffer) == 0
+
+
+async def test_buffer_never_loses_a_symbol_only_seen_in_an_older_frame():
+    buffer = TickerBuffer()
+    buffer.merge([ticker("XRPUSDT", 1, "0.5")])
+    for event_time in range(2, 1000):
+        buffer.merge([ticker("BTCUSDT", event_time, str(event_time))])
+
+    tickers = await buffer.take(size=100, interval=0.01)
+
+    assert {t["s"] for t in tickers} == {"XRPUSDT", "BTCUSDT"}
+
+
+async def test_take_flushes_on_size_without_waiting_for_the_interval():
+    buffer = TickerBuffer()
+    buffer.merge([ticker("BTCUSDT", 1, "1"), ticker("ETHUSDT", 1, "1")])
+    tickers = await asyncio.wait_for(buffer.take(size=2, interval=60), timeout=1)
+    assert len(tickers) == 2
+
+
+async def test_take_flushes_on_interval_and_waits_for_data():
+    buffer = TickerBuffer()
+    take = asyncio.create_task(buffer.take(size=10, interval=0.05))
+    await asyncio.sleep(0.05)
+    assert not take.done()
+
+    buffer.merge([ticker("BTCUSDT", 1, "1")])
+    assert [t["s"] for t in await asyncio.wait_for(take, timeout=1)] == ["BTCUSDT"]
+
+
+async def test_failed_writer_restarts_the_pipeline(monkeypatch):
+    starts = {"receiver": 0, "writer": 0}
+    restarted = asyncio.Event()
+
+    async def receive_coin_data(url, buffer):
+        starts["receiver"] += 1
+        await asyncio.Event().wait()
+
+    async def write_coin_data(buffer):
+        starts["writer"] += 1
+        if starts["writer"] == 1:
+            raise RuntimeError("redis is gone")
+        restarted.set()
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(services, "receive_coin_data", receive_coin_data)
+    monkeypatch.setattr(services, "write_coin_data", write_coin_data)
+
+    ingestion = asyncio.create_task(services.get_currency_data())
+    await asyncio.wait_for(restarted.wait(), timeout=5)
+    ingestion.cancel()
+
+    assert starts == {"receiver": 2, "writer": 2}
+
+
+async def test_unchanged_prices_are_not_rewritten(redis_client, monkeypatch):
+    monkeypatch.setattr(services, "last_written_prices", {})
+    await services.save_coin_data_to_redis([ticker("BTCUSDT", 1, "100")])
+    await redis_client.delete("BTCUSDT")
+
+    assert await services.save_coin_data_to_redis(
+        [ticker("BTCUSDT", 2, "100"), ticker("NOTAPAIR", 2, "1"), ticker("ETHUSDT", 2, "10")]) == [
+        ticker("ETHUSDT", 2, "10")]
+    assert await redis_client.get("BTCUSDT") is None
+    assert await redis_client.get("NOTAPAIR") is None
+
+    await services.save_coin_data_to_redis([ticker("BTCUSDT", 3, "101")])
+    assert await redis_client.get("BTCUSDT") is not None
+
+
+async def test_failed_write_forgets_the_last_written_prices(redis_client, monkeypatch):
+    monkeypatch.setattr(services, "last_written_prices", {"BTCUSDT": "100"})
+
+    def fail(*args, **kwargs):
+        raise ConnectionError("redis restarted")
+
+    monkeypatch.setattr(redis_client, "pipeline", fail)
+    errors = services.ingest_write_errors.value
+    with pytest.raises(ConnectionError):
+        await services.save_coin_data_to_redis([ticker("ETHUSDT", 1, "10")])
+
+    assert services.last_written_prices == {}
+    assert services.ingest_write_errors.value == errors + 1
+
+
+async def test_lag_is_observed_only_for_written_tickers(monkeypatch):
+    buffer = TickerBuffer()
+    buffer.merge([ticker("BTCUSDT", 1_000, "100"), ticker("ETHUSDT", 2_000, "10")])
+    lag = Histogram("test_ingest_lag_seconds", "Ingestion lag", registry=None)
+    monkeypatch.setattr(services, "ingest_lag", lag)
+
+    async def save_coin_data_to_redis(tickers):
+        return [tick for tick in tickers if tick["s"] == "ETHUSDT"]
+
+    monkeypatch.setattr(services, "save_coin_data_to_redis", save_coin_data_to_redis)
+    writer = asyncio.create_task(services.write_coin_data(buffer))
+    while not lag.count:
+        await asyncio.sleep(0.01)
+    writer.cancel()
+
+    assert lag.count == 1
+
+
+async def test_failed_write_stops_the_writer(redis_client, monkeypatch):
+    def fail(*args, **kwargs):
+        raise ConnectionError("redis restarted")
+
+    monkeypatch.setattr(redis_client, "pipeline", fail)
+    buffer = TickerBuffer()
+    buffer.merge([ticker("ETHUSDT", 1, "10")])
+
+    # The supervisor in get_currency_data sees the failure and restarts both tasks
+    with pytest.raises(ConnectionError):
+        await asyncio.wait_for(services.write_coin_data(buffer), 1)
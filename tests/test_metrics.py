@@ -0,0 +1,39 @@
+from src import metrics
+from src.metrics import Counter, Gauge, Histogram, LabeledGauge, LabeledHistogram, render
+
+
+def test_render_writes_the_prometheus_text_format(monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+    requests = Counter("requests_total", "Requests served")
+    requests.inc(3)
+    Gauge("queue_depth", "Jobs waiting").set(2)
+    LabeledGauge("tick_age_seconds", "Age of the last tick", "symbol", lambda: {"BTCUSDT": 1.5})
+    latency = Histogram("latency_seconds", "Latency", buckets=(0.1, 1), registry=metrics.REGISTRY)
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+    LabeledHistogram("route_seconds", "Per route", "route", buckets=(1,)).labels("GET /").observe(0.5)
+
+    assert render() == """\
+# HELP requests_total Requests served
+# TYPE requests_total counter
+requests_total 3.0
+# HELP queue_depth Jobs waiting
+# TYPE queue_depth gauge
+queue_depth 2.0
+# HELP tick_age_seconds Age of the last tick
+# TYPE tick_age_seconds gauge
+tick_age_seconds{symbol="BTCUSDT"} 1.5
+# HELP latency_seconds Latency
+# TYPE latency_seconds histogram
+latency_seconds_bucket{le="0.1"} 1
+latency_seconds_bucket{le="1.0"} 2
+latency_seconds_bucket{le="+Inf"} 3
+latency_seconds_sum 5.55
+latency_seconds_count 3
+# HELP route_seconds Per route
+# TYPE route_seconds histogram
+route_seconds_bucket{route="GET /",le="1.0"} 1
+route_seconds_bucket{route="GET /",le="+Inf"} 1
+route_seconds_sum{route="GET /"} 0.5
+route_seconds_count{route="GET /"} 1
+"""
@@ -0,0 +1,23 @@
+from decimal import Decimal
+
+from src.wallet.money import convert, cost_of, proceeds_of, to_amount
+
+
+def test_to_amount_quantizes_to_eight_places():
+    assert to_amount(0.1) == Decimal("0.10000000")
+    assert to_amount("1.000000005") == Decimal("1.00000000")
+    assert to_amount("1.000000015") == Decimal("1.00000002")
+
+
+def test_cost_rounds_up_and_proceeds_round_down():
+    quantity, price = Decimal("0.33333333"), Decimal("0.00000007")
+    assert cost_of(quantity, price) == Decimal("0.00000003")
+    assert proceeds_of(quantity, price) == Decimal("0.00000002")
+
+
+def test_exact_products_are_not_rounded():
+    assert cost_of(Decimal("0.1"), Decimal("2.5")) == proceeds_of(Decimal("0.1"), Decimal("2.5")) == Decimal("0.25")
+
+
+def test_convert_rounds_down():
+    assert convert(Decimal("1"), Decimal("1"), Decimal("3")) == Decimal("0.33333333")
@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from src.auth.hasher import password_hasher
+from src.auth.models import User, OAuthAccount
+from src.auth.schemas import UserCreate
+from src.auth.services import UserManager, register
+from src.auth.utilts import CachedUserDatabase
+from src.wallet.models import Wallet, Currency
+from src.wallet.services import create__wallet__statement
+
+
+def new_user(email):
+    return UserCreate(email=email, firstname="Gina", lastname="Doe", password="secret-password")
+
+
+async def wallet_rows(session, user_id):
+    result = await session.execute(select(Wallet.user_id, Currency.name, Currency.quantity)
+                                   .join(Currency, Currency.wallet_id == Wallet.id)
+                                   .where(Wallet.user_id == user_id))
+    return result.all()
+
+
+def test_wallet_and_opening_balance_are_one_statement():
+    sql = str(create__wallet__statement(7).compile(dialect=postgresql.dialect()))
+
+    assert sql.startswith("WITH new_wallet AS")
+    assert sql.count("INSERT INTO") == 2
+
+
+# INSERT ... RETURNING inside a CTE is Postgres-only
+@pytest.mark.postgres
+async def test_register_creates_the_wallet_and_opening_balance(postgres_session_factory):
+    async with postgres_session_factory() as session:
+        _, user = await register(new_user("gina@example.com"), session)
+
+        assert await wallet_rows(session, user["id"]) == [(user["id"], "USDT", Decimal(100000))]
+
+
+@pytest.mark.postgres
+async def test_manager_sign_up_creates_the_wallet_and_opening_balance(postgres_session_factory):
+    async with postgres_session_factory() as session:
+        manager = UserManager(CachedUserDatabase(session, User, OAuthAccount), password_helper=password_hasher)
+        user = await manager.create(new_user("hank@example.com"))
+
+        assert await wallet_rows(session, user.id) == [(user.id, "USDT", Decimal(100000))]
@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.websockets import WebSocketDisconnect
+
+from src.wallet import hub, stream
+from src.wallet.hub import OutboundQueue, dropped_updates, evicted_clients
+from src.wallet.stream import PriceStream, stream_currency_data
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "XRPUSDT"]
+
+
+class SlowWebSocket:
+    """Client that never sends anything and takes `delay` seconds per message."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+        self.closed_with = None
+
+    async def receive_json(self):
+        await asyncio.Event().wait()
+
+    async def send_json(self, data):
+        await asyncio.sleep(self.delay)
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=None):
+        self.closed_with = code
+
+
+async def flood(streams):
+    price = 0
+    while True:
+        price += 1
+        for watched in streams:
+            for symbol in SYMBOLS:
+                watched.queue.put_nowait({"s": symbol, "E": price, "c": str(price)})
+        await asyncio.sleep(0.001)
+
+
+async def test_slow_consumer_is_evicted(monkeypatch):
+    streams = []
+
+    class FloodedStream(PriceStream):
+        def __init__(self, websocket, rate):
+            super().__init__(websocket, rate)
+            self.symbols = set(SYMBOLS)
+            self.queue = OutboundQueue(maxsize=2)
+            streams.append(self)
+
+    monkeypatch.setattr(stream, "PriceStream", FloodedStream)
+    monkeypatch.setattr(stream, "WS_MAX_UPDATE_RATE", 100)
+    monkeypatch.setattr(hub, "WS_SLOW_CONSUMER_TIMEOUT", 0.05)
+    dropped, evicted = dropped_updates.value, evicted_clients.value
+    websocket = SlowWebSocket(delay=0.03)
+
+    flooder = asyncio.create_task(flood(streams))
+    try:
+        await asyncio.wait_for(stream_currency_data(websocket, rate=100), 2)
+    finally:
+        flooder.cancel()
+
+    assert websocket.closed_with == 1013
+    assert dropped_updates.value > dropped
+    assert evicted_clients.value == evicted + 1
+
+
+class ScriptedWebSocket(SlowWebSocket):
+    """Client that sends `messages`, then stays connected without saying more."""
+
+    def __init__(self, messages):
+        super().__init__()
+        self.messages = asyncio.Queue()
+        for message in messages:
+            self.messages.put_nowait(message)
+
+    async def receive_json(self):
+        return await self.messages.get()
+
+
+@pytest.fixture
+def hub_subscriptions(monkeypatch):
+    subscriptions = {}
+
+    async def check_pair_in_list(symbol):
+        if symbol not in SYMBOLS:
+            raise HTTPException(status_code=400, detail={"message": "Currency not found"})
+
+    async def get_last_ticks(symbol, count):
+        return [{"s": symbol, "E": 1, "c": "100"}]
+
+    async def subscribe(symbol, queue):
+        subscriptions.setdefault(symbol, set()).add(queue)
+
+    async def unsubscribe(symbol, queue):
+        subscriptions.get(symbol, set()).discard(queue)
+
+    monkeypatch.setattr(stream, "check_pair_in_list", check_pair_in_list)
+    monkeypatch.setattr(stream, "get_last_ticks", get_last_ticks)
+    monkeypatch.setattr(stream.price_hub, "subscribe", subscribe)
+    monkeypatch.setattr(stream.price_hub, "unsubscribe", unsubscribe)
+    monkeypatch.setattr(stream, "WS_MAX_UPDATE_RATE", 100)
+    return subscriptions
+
+
+async def wait_until(condition):
+    while not condition():
+        await asyncio.sleep(0.005)
+
+
+async def test_commands_manage_the_subscriptions(hub_subscriptions):
+    websocket = ScriptedWebSocket([
+        {"action": "subscribe", "symbols": ["btcusdt", "ethusdt", "NOPE"]},
+        {"action": "unsubscribe", "symbols": ["ETHUSDT"]},
+        {"action": "dance"},
+    ])
+    price_stream = PriceStream(websocket, rate=100)
+    running = asyncio.create_task(price_stream.run())
+    await asyncio.wait_for(wait_until(lambda: len(websocket.sent) >= 5), 1)
+
+    assert {"symbol": "NOPE", "error": {"message": "Currency not found"}} in websocket.sent
+    assert {"subscribed": ["BTCUSDT", "ETHUSDT"]} in websocket.sent
+    assert {"subscribed": ["BTCUSDT"]} in websocket.sent
+    assert {"error": {"message": "Unknown action"}} in websocket.sent
+    prices = [price for message in websocket.sent for price in message.get("prices", [])]
+    assert {"time": 1, "symbol": "BTCUSDT", "price": "100"} in prices
+
+    running.cancel()
+    await asyncio.gather(running, return_exceptions=True)
+    assert not any(hub_subscriptions.values())
+
+
+async def test_only_the_newest_changed_price_is_sent(hub_subscriptions):
+    websocket = ScriptedWebSocket([])
+    price_stream = PriceStream(websocket, rate=100)
+    price_stream.symbols = {"BTCUSDT", "ETHUSDT"}
+    price_stream.sent_prices = {"ETHUSDT": "10"}
+    for tick in ({"s": "BTCUSDT", "E": 1, "c": "100"}, {"s": "BTCUSDT", "E": 2, "c": "101"},
+                 {"s": "ETHUSDT", "E": 2, "c": "10"}, {"s": "XRPUSDT", "E": 2, "c": "1"}):
+        price_stream.queue.put_nowait(tick)
+
+    running = asyncio.create_task(price_stream.run())
+    await asyncio.wait_for(wait_until(lambda: websocket.sent), 1)
+    running.cancel()
+    await asyncio.gather(running, return_exceptions=True)
+
+    assert websocket.sent == [{"prices": [{"time": 2, "symbol": "BTCUSDT", "price": "101"}]}]
+
+
+async def test_run_waits_for_both_tasks_to_finish(hub_subscriptions):
+    class DisconnectedWebSocket(ScriptedWebSocket):
+        async def receive_json(self):
+            raise WebSocketDisconnect()
+
+    price_stream = PriceStream(DisconnectedWebSocket([]), rate=100)
+    tasks_before = asyncio.all_tasks()
+
+    with pytest.raises(WebSocketDisconnect):
+        await price_stream.run()
+
+    assert asyncio.all_tasks() == tasks_before
+
+
+@pytest.mark.parametrize("rate, interval", [(float("nan"), 0.5), (float("inf"), 0.5), (-1, 10), (1, 1), (50, 0.5)])
+def test_rate_is_validated_and_clamped(monkeypatch, rate, interval):
+    monkeypatch.setattr(stream, "WS_MAX_UPDATE_RATE", 2)
+    assert PriceStream(SlowWebSocket(), rate=rate).interval == interval
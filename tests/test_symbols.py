@@ -0,0 +1,63 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from src.wallet.symbols import SymbolRegistry
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "exchange_info.json")
+
+
+@pytest.fixture
+def symbols_file(tmp_path):
+    path = tmp_path / "exchange_info.json"
+    shutil.copy(FIXTURE, path)
+    return path
+
+
+def test_only_trading_usdt_pairs_are_loaded(symbols_file):
+    registry = SymbolRegistry(str(symbols_file))
+    registry.load()
+
+    assert sorted(info.symbol for info in registry.pairs()) == ["BTCUSDT", "ETHUSDT"]
+    assert registry.get_pair("BTCUSDT").base == "BTC"
+    assert registry.get_base("ETH").symbol == "ETHUSDT"
+    assert registry.get_pair("ETHBTC") is None
+
+
+def test_supported_pairs_and_currencies(symbols_file):
+    registry = SymbolRegistry(str(symbols_file))
+    registry.load()
+
+    assert registry.is_supported_pair("BTCUSDT")
+    assert not registry.is_supported_pair("LUNAUSDT")
+    assert not registry.is_supported_pair("ETHBTC")
+    assert registry.is_supported_currency("ETH")
+    assert registry.is_supported_currency("USDT")
+    assert not registry.is_supported_currency("LUNA")
+
+
+def test_reload_only_when_the_file_changes(symbols_file):
+    registry = SymbolRegistry(str(symbols_file))
+    registry.load()
+    assert not registry.reload_if_changed()
+
+    exchange_info = json.loads(symbols_file.read_text())
+    exchange_info["symbols"][2]["status"] = "TRADING"
+    symbols_file.write_text(json.dumps(exchange_info))
+    stat = os.stat(symbols_file)
+    os.utime(symbols_file, (stat.st_atime, stat.st_mtime + 1))
+
+    assert registry.reload_if_changed()
+    assert registry.is_supported_pair("LUNAUSDT")
+    assert not registry.reload_if_changed()
+
+
+def test_shipped_symbols_file_loads():
+    from src.config import SYMBOLS_FILE
+
+    registry = SymbolRegistry(SYMBOLS_FILE)
+    registry.load()
+    assert registry.is_supported_pair("BTCUSDT")
+    assert all(info.quote == "USDT" for info in registry.pairs())
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src import tracing
+from src.tracing import RequestTrace, TracingMiddleware, current_trace, instrument_engine, span
+
+
+@pytest.fixture
+def trace():
+    trace = RequestTrace("GET", "/test")
+    token = current_trace.set(trace)
+    yield trace
+    current_trace.reset(token)
+
+
+def test_span_is_recorded_only_inside_a_trace(trace):
+    with span("redis", "GET"):
+        pass
+    current_trace.set(None)
+    with span("redis", "SET"):
+        pass
+
+    assert [(recorded["kind"], recorded["name"]) for recorded in trace.spans] == [("redis", "GET")]
+
+
+async def test_failed_statements_are_recorded_and_unwound(trace):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine)
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                await connection.execute(text("SELECT * FROM missing"))
+        info = connection.sync_connection.info
+
+        assert info["trace_started_at"] == []
+    await engine.dispose()
+
+    assert [recorded["name"] for recorded in trace.spans] == ["SELECT 1"] + ["SELECT * FROM missing"] * 3
+
+
+async def test_middleware_times_the_request_and_exports_it(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(path))
+
+    async def app(scope, receive, send):
+        with span("sql", "SELECT 1"):
+            pass
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    await TracingMiddleware(app)({"type": "http", "method": "POST", "path": "/orders"}, None, send)
+    tracing.trace_writer.submit(lambda: None).result()
+
+    trace = tracing.recent_traces[-1]
+    assert (trace.method, trace.route, trace.status) == ("POST", "<unmatched>", 201)
+    record = json.loads(path.read_text().splitlines()[-1])
+    assert record["status"] == 201
+    assert [recorded["name"] for recorded in record["spans"]] == ["SELECT 1"]
+    assert set(record["breakdown"]) == {"sql", "python"}
@@ -0,0 +1,235 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DBAPIError
+
+from src.auth.models import User
+from src.config import BATCH_MAX_ORDERS
+from src.wallet import schemas, services
+from src.wallet.models import Wallet, Currency, Transaction
+
+
+class PostgresError(Exception):
+    def __init__(self, sqlstate):
+        super().__init__(sqlstate)
+        self.sqlstate = sqlstate
+
+
+def failing(sqlstate, times):
+    calls = []
+
+    async def apply():
+        calls.append(None)
+        if len(calls) <= times:
+            raise DBAPIError("UPDATE currency ...", None, PostgresError(sqlstate))
+        return "done"
+
+    return apply, calls
+
+
+async def test_deadlock_is_retried(session):
+    apply, calls = failing("40P01", times=1)
+    assert await services.run__trade(session, apply) == "done"
+    assert len(calls) == 2
+
+
+async def test_retries_are_bounded_and_reported_as_conflict(session, monkeypatch):
+    monkeypatch.setattr(services, "TRADE_MAX_ATTEMPTS", 3)
+    apply, calls = failing("40001", times=10)
+    with pytest.raises(HTTPException) as error:
+        await services.run__trade(session, apply)
+    assert error.value.status_code == 409
+    assert len(calls) == 3
+
+
+async def test_other_database_errors_are_not_retried(session):
+    apply, calls = failing("23505", times=1)
+    with pytest.raises(DBAPIError):
+        await services.run__trade(session, apply)
+    assert len(calls) == 1
+
+
+def test_batch_size_is_capped():
+    order = {"currency": "BTC", "quantity": "1", "type": "PURCHASE"}
+    schemas.BatchOrderSchema(orders=[order] * BATCH_MAX_ORDERS)
+    with pytest.raises(ValidationError):
+        schemas.BatchOrderSchema(orders=[order] * (BATCH_MAX_ORDERS + 1))
+    with pytest.raises(ValidationError):
+        schemas.BatchOrderSchema(orders=[])
+
+
+@pytest.mark.parametrize("endpoint, transaction, expected_type", [
+    (services.buy__currency, schemas.PurchaseCoinSchema(currency="btc", currency_2=None, quantity="1"), "PURCHASE"),
+    (services.sell__currency, schemas.SaleCoinSchema(currency="btc", currency_2=None, quantity="1",
+                                                     type="PURCHASE"), "SALE"),
+    (services.swap__currency, schemas.SwapCoinSchema(currency="btc", currency_2="eth", quantity="1"), "SWAP"),
+])
+async def test_single_trades_go_through_apply_order(session, monkeypatch, endpoint, transaction, expected_type):
+    applied = []
+
+    async def get_current_prices(currencies):
+        return {currency: Decimal(2) for currency in currencies}
+
+    async def apply__order(wallet_id, order, prices, session):
+        applied.append((order, prices))
+        return {"message": "ok"}
+
+    monkeypatch.setattr(services, "get_current_prices", get_current_prices)
+    monkeypatch.setattr(services, "apply__order", apply__order)
+
+    assert await endpoint(user_id=1, transaction=transaction, session=session) == {"message": "ok"}
+    order, prices = applied[0]
+    assert order.type == expected_type
+    assert set(prices) == services.order__currencies(order)
+
+
+async def holdings(session, wallet_id):
+    result = await session.execute(select(Currency.name, Currency.quantity).where(Currency.wallet_id == wallet_id))
+    return dict(result.all())
+
+
+async def journal(session, wallet_id):
+    result = await session.execute(select(Transaction.type, Transaction.currency, Transaction.quantity)
+                                   .where(Transaction.wallet_id == wallet_id).order_by(Transaction.id))
+    return result.all()
+
+
+def trade(session, apply, **kwargs):
+    return services.run__trade(session, lambda: apply(session=session, **kwargs))
+
+
+async def test_purchase_debits_usdt_and_credits_the_coin(session, wallet):
+    balance = await trade(session, services.apply__purchase, wallet_id=wallet.id, currency="BTC",
+                          quantity=Decimal("0.5"), price=Decimal("100.00000001"))
+
+    assert balance == Decimal("949.99999999")
+    assert await holdings(session, wallet.id) == {"USDT": Decimal("949.99999999"), "BTC": Decimal("0.5")}
+    assert await journal(session, wallet.id) == [("PURCHASE", "BTC", Decimal("0.5"))]
+
+
+async def test_sale_and_swap_move_existing_holdings(session, wallet):
+    await trade(session, services.apply__purchase, wallet_id=wallet.id, currency="BTC", quantity=Decimal(2),
+                price=Decimal(100))
+    await trade(session, services.apply__sale, wallet_id=wallet.id, currency="BTC", quantity=Decimal("0.5"),
+                price=Decimal(120))
+    await trade(session, services.apply__swap, wallet_id=wallet.id, currency="BTC", currency_2="ETH",
+                quantity=Decimal(1), quantity_2=Decimal(40))
+
+    assert await holdings(session, wallet.id) == {"USDT": Decimal(860), "BTC": Decimal("0.5"), "ETH": Decimal(40)}
+    assert [row.type for row in await journal(session, wallet.id)] == ["PURCHASE", "SALE", "SWAP"]
+
+
+@pytest.mark.parametrize("apply, kwargs, message", [
+    (services.apply__purchase, {"currency": "BTC", "quantity": Decimal(11), "price": Decimal(100)},
+     "Your balance is less than transaction price"),
+    (services.apply__sale, {"currency": "BTC", "quantity": Decimal(1), "price": Decimal(100)},
+     "You have no BTC coin"),
+    (services.apply__swap, {"currency": "USDT", "currency_2": "BTC", "quantity": Decimal("1000.00000001"),
+                            "quantity_2": Decimal(10)}, "Your balance is less than transaction price"),
+])
+async def test_overdraft_is_rejected_without_partial_writes(session, wallet, apply, kwargs, message):
+    with pytest.raises(HTTPException) as error:
+        await trade(session, apply, wallet_id=wallet.id, **kwargs)
+
+    assert error.value.status_code == 400
+    assert error.value.detail == {"message": message}
+    assert await holdings(session, wallet.id) == {"USDT": Decimal(1000)}
+    assert await journal(session, wallet.id) == []
+
+
+async def test_selling_more_than_held_is_rejected(session, wallet):
+    await trade(session, services.apply__purchase, wallet_id=wallet.id, currency="BTC", quantity=Decimal(1),
+                price=Decimal(100))
+
+    with pytest.raises(HTTPException) as error:
+        await trade(session, services.apply__sale, wallet_id=wallet.id, currency="BTC", quantity=Decimal(2),
+                    price=Decimal(100))
+
+    assert error.value.detail == {"message": "You can't sell more coins than you have"}
+    assert await holdings(session, wallet.id) == {"USDT": Decimal(900), "BTC": Decimal(1)}
+
+
+async def test_unknown_wallet_is_not_found(session, wallet):
+    with pytest.raises(HTTPException) as error:
+        await trade(session, services.apply__purchase, wallet_id=wallet.id + 1, currency="BTC",
+                    quantity=Decimal(1), price=Decimal(1))
+    assert error.value.status_code == 404
+
+
+async def test_order_is_applied_by_user_through_the_retry_loop(session, wallet, monkeypatch):
+    async def get_current_prices(currencies):
+        return {"BTC": Decimal(100)}
+
+    monkeypatch.setattr(services, "get_current_prices", get_current_prices)
+    transaction = schemas.PurchaseCoinSchema(currency="btc", currency_2=None, quantity="1")
+
+    result = await services.buy__currency(user_id=wallet.user_id, transaction=transaction, session=session)
+
+    assert result["message"] == "1.00000000 BTC successfully purchased"
+    assert await holdings(session, wallet.id) == {"USDT": Decimal(900), "BTC": Decimal(1)}
+
+
+async def test_deadlocked_trade_is_rolled_back_and_retried(session, wallet, monkeypatch):
+    locks = []
+    lock__currencies = services.lock__currencies
+
+    async def deadlock_once(wallet_id, names, session):
+        locks.append(sorted(set(names)))
+        await lock__currencies(wallet_id=wallet_id, names=names, session=session)
+        if len(locks) == 1:
+            # A partial write the rollback has to undo before the retry
+            await services.debit__currency(wallet_id=wallet_id, name="USDT", quantity=Decimal(500), session=session)
+            raise DBAPIError("SELECT ... FOR UPDATE", None, PostgresError("40P01"))
+
+    monkeypatch.setattr(services, "lock__currencies", deadlock_once)
+
+    await trade(session, services.apply__purchase, wallet_id=wallet.id, currency="BTC", quantity=Decimal(1),
+                price=Decimal(100))
+
+    assert locks == [["BTC", "USDT"], ["BTC", "USDT"]]
+    assert await holdings(session, wallet.id) == {"USDT": Decimal(900), "BTC": Decimal(1)}
+    assert len(await journal(session, wallet.id)) == 1
+
+
+async def test_holdings_are_locked_in_name_order():
+    statements = []
+
+    class RecordingSession:
+        async def execute(self, stmt):
+            statements.append(stmt)
+
+    await services.lock__currencies(wallet_id=1, names=("USDT", "BTC", "USDT"), session=RecordingSession())
+
+    sql = str(statements[0].compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    assert "IN ('BTC', 'USDT')" in sql
+    assert sql.endswith("ORDER BY currency.name FOR UPDATE")
+
+
+@pytest.mark.postgres
+async def test_concurrent_buys_and_sells_do_not_deadlock(postgres_session_factory):
+    """Opposite-direction trades on one wallet, which deadlocked before the ordered lock."""
+    async with postgres_session_factory() as session:
+        user = User(email="erin@example.com", firstname="Erin", lastname="Doe", role_id=1, hashed_password="x")
+        session.add(user)
+        await session.flush()
+        wallet = Wallet(user_id=user.id)
+        session.add(wallet)
+        await session.flush()
+        session.add_all([Currency(wallet_id=wallet.id, name="USDT", quantity=Decimal(100000)),
+                         Currency(wallet_id=wallet.id, name="BTC", quantity=Decimal(1000))])
+        await session.commit()
+        wallet_id = wallet.id
+
+    async def one(apply):
+        async with postgres_session_factory() as session:
+            await trade(session, apply, wallet_id=wallet_id, currency="BTC", quantity=Decimal(1), price=Decimal(10))
+
+    await asyncio.gather(*(one(services.apply__purchase if i % 2 else services.apply__sale) for i in range(50)))
+
+    async with postgres_session_factory() as session:
+        assert await holdings(session, wallet_id) == {"USDT": Decimal(100000), "BTC": Decimal(1000)}
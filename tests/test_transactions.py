@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from src.auth.models import User
+from src.wallet.models import Wallet, Transaction
+from src.wallet.services import (decode_transaction_cursor, encode_transaction_cursor, as_executed_at,
+                                 get__all__transaction)
+
+
+def test_cursor_round_trip():
+    transaction = Transaction(id=42, executed_at=datetime(2024, 1, 2, 3, 4, 5, 678))
+    cursor = encode_transaction_cursor(transaction)
+
+    assert decode_transaction_cursor(cursor) == (datetime(2024, 1, 2, 3, 4, 5, 678), 42)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "WzFd", ""])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_transaction_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_aware_datetimes_become_naive_local_time():
+    moment = datetime(2024, 1, 2, 3, 4, 5)
+    aware = moment.astimezone(timezone(timedelta(hours=5)))
+
+    assert as_executed_at(aware) == moment
+    assert as_executed_at(aware).tzinfo is None
+    assert as_executed_at(moment) is moment
+
+
+async def make_transactions(session, times):
+    user = User(email="carol@example.com", firstname="Carol", lastname="Doe", role_id=1, hashed_password="x")
+    session.add(user)
+    await session.flush()
+    wallet = Wallet(user_id=user.id)
+    session.add(wallet)
+    await session.flush()
+    session.add_all(Transaction(wallet_id=wallet.id, currency="BTC", quantity=1, price=1, type="PURCHASE",
+                                executed_at=executed_at) for executed_at in times)
+    await session.commit()
+    return user.id
+
+
+async def test_filters_accept_timezone_aware_bounds(session):
+    times = [datetime(2024, 1, day, 12) for day in (1, 2, 3)]
+    user_id = await make_transactions(session, times)
+
+    result = await get__all__transaction(user_id=user_id, session=session,
+                                         since=times[1].astimezone(timezone.utc),
+                                         until=times[2].astimezone(timezone(timedelta(hours=-3))))
+
+    assert [row["Transaction"].executed_at for row in result["transactions"]] == [times[1]]
+
+
+async def test_empty_time_range_is_a_bad_request(session):
+    result = await get__all__transaction(user_id=1, session=session,
+                                         since=datetime(2024, 1, 2, tzinfo=timezone.utc),
+                                         until=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    assert isinstance(result, HTTPException)
+    assert result.status_code == 400
@@ -0,0 +1,61 @@
+import pytest
+from fastapi_users import exceptions
+from sqlalchemy import select, update
+
+from src.auth.base_config import get_jwt_strategy
+from src.auth.cache import user_cache
+from src.auth.hasher import password_hasher
+from src.auth.models import User
+from src.auth.schemas import UserUpdate
+
+
+@pytest.fixture(autouse=True)
+def clear_user_cache():
+    user_cache._local.clear()
+
+
+async def test_token_is_resolved_from_the_cache(user, user_manager, redis_client):
+    manager, user_id = user_manager, user.id
+    strategy = get_jwt_strategy()
+    token = await strategy.write_token(await manager.get(user_id))
+
+    user = await strategy.read_token(token, manager)
+
+    assert user.id == user_id
+    assert user_id in user_cache._local
+    assert await redis_client.get(f"user:{user_id}") is not None
+
+
+async def test_reset_password_after_cached_authentication(user, user_manager, reset_tokens, redis_client):
+    manager, user_id = user_manager, user.id
+    strategy = get_jwt_strategy()
+    await strategy.read_token(await strategy.write_token(await manager.get(user_id)), manager)
+    assert user_id in user_cache._local
+
+    await manager.forgot_password(await manager.get(user_id))
+    user = await manager.reset_password(reset_tokens[0], "new-password")
+
+    assert password_hasher.verify_and_update("new-password", user.hashed_password)[0]
+    # The write dropped the cached copy
+    assert user_id not in user_cache._local
+
+
+async def test_get_cached_raises_for_unknown_user(user_manager, redis_client):
+    with pytest.raises(exceptions.UserNotExists):
+        await user_manager.get_cached(999)
+
+
+async def test_update_from_a_stale_snapshot_keeps_stored_flags(session, user, user_manager, redis_client):
+    manager, user_id = user_manager, user.id
+    await manager.get_cached(user_id)
+    # An admin deactivates the user, and the cache invalidation is lost
+    await session.execute(update(User).where(User.id == user_id).values(is_active=False, is_superuser=True))
+    await session.commit()
+    snapshot = await manager.get_cached(user_id)
+    assert snapshot.is_active
+
+    user = await manager.update(UserUpdate(email="alicia@example.com"), snapshot)
+
+    assert (user.email, user.is_active, user.is_superuser) == ("alicia@example.com", False, True)
+    stored = (await session.execute(select(User.email, User.is_active).where(User.id == user_id))).one()
+    assert tuple(stored) == ("alicia@example.com", False)
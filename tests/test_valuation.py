@@ -0,0 +1,61 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from src.auth.models import User
+from src.wallet import services
+from src.wallet.models import Wallet, Currency
+from src.wallet.services import value__holdings, value__wallets
+
+
+def test_holdings_are_valued_exactly():
+    quantities = [Decimal("123456789012.12345678"), Decimal("0.00000001"), Decimal("10")]
+    prices = {"BTC": Decimal("67890.12345678")}
+
+    row_prices, row_values, totals = value__holdings([1, 1, 2], ["BTC", "USDT", "LUNA"], quantities, prices)
+
+    assert row_prices == [Decimal("67890.12345678"), Decimal(1), None]
+    assert row_values == [Decimal("8381496647610702.05693714"), Decimal("0.00000001"), None]
+    assert totals == {1: Decimal("8381496647610702.05693715"), 2: Decimal(0)}
+
+
+async def test_wallet_valuations_are_strings(monkeypatch):
+    async def get_current_prices(currencies):
+        return {"ETH": Decimal("3000.5")}
+
+    monkeypatch.setattr(services, "get_current_prices", get_current_prices)
+    rows = [SimpleNamespace(wallet_id=7, name="ETH", quantity=Decimal("0.10000000")),
+            SimpleNamespace(wallet_id=7, name="USDT", quantity=Decimal("0.20000000"))]
+
+    valuations = await value__wallets(rows)
+
+    assert valuations == {7: {"wallet_id": 7, "total": "300.25000000", "currencies": [
+        {"name": "ETH", "quantity": "0.10000000", "price": "3000.5", "value": "300.05000000"},
+        {"name": "USDT", "quantity": "0.20000000", "price": "1", "value": "0.20000000"},
+    ]}}
+
+
+async def test_all_wallets_are_valued_one_page_at_a_time(session, monkeypatch):
+    async def get_current_prices(currencies):
+        return {}
+
+    monkeypatch.setattr(services, "get_current_prices", get_current_prices)
+    for i in range(5):
+        user = User(email=f"user{i}@example.com", firstname="U", lastname="Doe", role_id=1, hashed_password="x")
+        session.add(user)
+        await session.flush()
+        wallet = Wallet(user_id=user.id)
+        session.add(wallet)
+        await session.flush()
+        session.add(Currency(wallet_id=wallet.id, name="USDT", quantity=Decimal(i)))
+    await session.commit()
+
+    pages = []
+    after = None
+    while True:
+        page = await services.get__wallets__valuation(user_ids=None, session=session, limit=2, after=after)
+        pages.append([wallet["total"] for wallet in page["wallets"]])
+        after = page["next_cursor"]
+        if after is None:
+            break
+
+    assert pages == [["0.00000000", "1.00000000"], ["2.00000000", "3.00000000"], ["4.00000000"]]